@@ -0,0 +1,135 @@
+#
+# An anytime hint search with a wall-clock budget. Runs the same depth-first
+#   branch-and-bound search as bounds.hint(), over the same moves in the same
+#   order, with a Clock that stops it when time runs out. The clock keeps
+#   track of the fewest pegs any game played out so far has left, so the
+#   best line found so far is known at any time, and every value found is a
+#   peg count that can really be reached. Every move is first played out
+#   greedily, which gives a fallback for moves the search does not get to.
+#   When time runs out, the best move found so far is returned along with
+#   whether it is proven to be the best. Given the time, the result is that
+#   of bounds.hint().
+#
+
+import time
+
+from bounds import _search
+from stats import Cancelled
+from table import TranspositionTable
+
+# Number of positions searched between two looks at the clock
+CHECK_EVERY = 256
+
+class Timeout(Exception):
+    pass
+
+
+class Clock:
+
+
+    # deadline  ->  time.monotonic() value at which the search must stop
+    # cancel    ->  threading.Event that stops the search early once set, or
+    #                   None
+    # count     ->  positions searched since the clock was last looked at
+    # nodes     ->  positions searched in total
+    # lowest    ->  fewest pegs left by a game played out since it was last
+    #                   reset, None if there was none
+    def __init__(self, budget, cancel=None):
+        self.deadline = time.monotonic() + budget
+        self.cancel = cancel
+        self.count = 0
+        self.nodes = 0
+        self.lowest = None
+
+
+    # Count a position. Raises Timeout once the budget is spent or the search
+    # is cancelled.
+    def tick(self):
+        self.count += 1
+        if self.count == CHECK_EVERY:
+            self.nodes += self.count
+            self.count = 0
+            if time.monotonic() >= self.deadline:
+                raise Timeout()
+            if self.cancel is not None and self.cancel.is_set():
+                raise Timeout()
+
+
+    # Note a game played out, or a position whose best case is known, that
+    # leaves `pegs` pegs.
+    def reached(self, pegs):
+        if self.lowest is None or pegs < self.lowest:
+            self.lowest = pegs
+
+
+# Return [best_case, move, proven]. best_case is the fewest pegs the search
+# found a way to leave within `budget` seconds, and move is the first move
+# (in table order) that leaves them. When proven is True, the result is the
+# same as Engine.hint(). Otherwise it is the best found so far.
+#
+# engine    ->  Engine of the board
+# bounds    ->  Bounds of the board
+# state     ->  the packed board
+# pegs      ->  number of pegs on the board
+# budget    ->  number of seconds to search for
+# table     ->  TranspositionTable shared with bounds.hint()
+# stats     ->  SearchStats to count into, or None
+# cancel    ->  threading.Event that ends the search early, as if the budget
+#                   ran out, once it is set. None if only the budget does
+def hint(engine, bounds, state, pegs, budget, table=None, stats=None, cancel=None):
+    if table is None:
+        table = TranspositionTable()
+    if stats is not None:
+        stats.node(pegs)
+    moves = engine.legal_moves(state)
+    if pegs == 1 or not moves:
+        return [pegs, None, True]
+
+    clock = Clock(budget, cancel)
+    floor = bounds.lower(state, pegs)
+
+    # found[n] -> fewest pegs found a way to leave after the nth move
+    # exact[n] -> whether the nth move is known not to leave fewer pegs than
+    #                 found[n], nor fewer than the moves before it
+    found = [_playout(engine, bounds, state ^ engine.table[k][2], pegs - 1) for k in moves]
+    exact = [False] * len(moves)
+    best_case = pegs
+    try:
+        for n, k in enumerate(moves):
+            clock.lowest = None
+            if stats is not None:
+                stats.hops += 1
+            result = _search(engine, bounds, state ^ engine.table[k][2], pegs - 1, best_case, table,
+                             stats, clock)
+            if stats is not None:
+                stats.rewinds += 1
+            if result < best_case:
+                best_case = found[n] = result
+            else:
+                found[n] = min(found[n], clock.lowest or pegs)
+            exact[n] = True
+            if best_case <= floor:
+                if stats is not None:
+                    stats.pruned += len(moves) - n - 1
+                break
+    except (Timeout, Cancelled):
+        if clock.lowest is not None:
+            found[n] = min(found[n], clock.lowest)
+
+    best_case = min(found)
+    n = found.index(best_case)
+    proven = all(exact[:n + 1]) and (best_case <= floor or all(exact))
+    return [best_case, moves[n], proven]
+
+
+# Helper method for hint. Plays the game out from `state`, always making the
+# move the search would try first, and returns the number of pegs left. A
+# quick, reachable estimate of how good a position is.
+def _playout(engine, bounds, state, pegs):
+    while pegs > 1:
+        children = bounds.children(engine, state, pegs)
+        if not children:
+            break
+        state = children[0]
+        pegs -= 1
+    return pegs
@@ -0,0 +1,227 @@
+#
+# Headless batch analysis: works out the hint, the solve histogram and the
+#   number of winning games of many positions at once, without the
+#   `interface` module. A job is a board size, a starting hole and a move
+#   prefix played from it. Results are streamed as JSON Lines or CSV, one
+#   record per job, as soon as each job is done, and a throughput summary is
+#   printed to stderr at the end.
+#
+#   Jobs leading to the same position up to rotation and reflection are
+#   grouped and handed to the same worker, so the position is only solved
+#   once and the hint of every orientation after the first is read back from
+#   the worker's transposition tables. Each worker keeps those tables for the
+#   whole batch, and the persistent cache (see cache.py) is shared between
+#   workers and between runs when it exists.
+#
+# Usage:
+#   python batch.py --sizes 15 21 --holes all --analyses hint solve wins
+#   python batch.py --sizes 15 --holes a d --prefix d-a f-d --format csv
+#
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from board import Board
+from cache import open_cache
+import geometry
+
+ANALYSES = ("hint", "solve", "wins")
+
+FIELDS = ("size", "start", "prefix", "pegs", "best", "hint", "games", "wins",
+          "histogram", "shared", "seconds", "error")
+
+# Worker process state: dictionary mapping a board size to the [table, hints]
+# transposition tables shared by every board of that size
+_tables = dict()
+
+
+# Return a board of `size` holes with hole `start` empty and the moves of
+# `prefix` played, or a message saying why there is none. Boards are built
+# straight from their geometry, so that nothing but records is ever printed.
+#
+# size      ->  number of holes
+# start     ->  name of the empty hole
+# prefix    ->  list of [src, dest] hole names
+def position(size, start, prefix):
+    shape = geometry.for_size(size)
+    if shape is None:
+        return "no board of {} holes".format(size)
+    board = Board(shape)
+    tables = _tables.get(size)
+    if tables is None:
+        tables = _tables[size] = [board.table, board.hints]
+    board.table, board.hints = tables
+    hole = board.hole(start)
+    if hole is None:
+        return "no hole named {}".format(start)
+    board.remove_peg(hole)
+    for src, dest in prefix:
+        l, m = board.hole(src), board.hole(dest)
+        if l is None or m is None or m not in l.adj_holes or not board.hop_peg(l, l.adj_holes[m], m):
+            return "illegal move {}-{}".format(src, dest)
+    return board
+
+
+# Return the jobs of a batch as [size, start, prefix] in the order they are
+# to be reported.
+#
+# sizes     ->  board sizes
+# holes     ->  names of the starting holes, or ["all"] for every hole
+# prefix    ->  list of [src, dest] hole names played from every start
+def jobs(sizes, holes, prefix):
+    result = []
+    for size in sizes:
+        shape = geometry.for_size(size)
+        names = [hole.name for hole in shape.holes] if shape is not None and holes == ["all"] else holes
+        for start in names:
+            result.append([size, start, prefix])
+    return result
+
+
+# Return the jobs grouped by the position they lead to, as a list of groups
+# of [n, job] where n is the index of the job. Jobs whose position can not be
+# set up are each a group of their own, reported as an error.
+def groups(batch):
+    result, found = [], dict()
+    for n, job in enumerate(batch):
+        board = position(*job)
+        if isinstance(board, str):
+            result.append([[n, job]])
+            continue
+        key = (job[0], board.engine.key(board.state))
+        if key not in found:
+            found[key] = len(result)
+            result.append([])
+        result[found[key]].append([n, job])
+    _tables.clear()     # only meant for the workers
+    return result
+
+
+# Worker task. Runs `analyses` on the position of every job in `group` and
+# returns [[n, record], ...]. The histogram is worked out once for the whole
+# group, since symmetric positions have the same games, and every job after
+# the first is marked as shared.
+def run(group, analyses):
+    result, counts = [], None
+    for i, (n, job) in enumerate(group):
+        start = time.perf_counter()
+        record = dict.fromkeys(FIELDS)
+        record.update(size=job[0], start=job[1], prefix=["-".join(move) for move in job[2]],
+                      shared=i > 0)
+        board = position(*job)
+        if isinstance(board, str):
+            record["error"] = board
+            result.append([n, record])
+            continue
+        record["pegs"] = board.pegs_left
+        if "hint" in analyses:
+            best_case, l, m, _ = board.hint()
+            record["best"] = best_case
+            record["hint"] = None if l is None else "{}-{}".format(l.name, m.name)
+        if "solve" in analyses or "wins" in analyses:
+            if counts is None:
+                counts = board.solve()
+            record["games"] = sum(counts.values())
+            record["wins"] = counts.get(1, 0)
+            if "solve" in analyses:
+                record["histogram"] = { str(left): counts[left] for left in sorted(counts) }
+        record["seconds"] = round(time.perf_counter() - start, 4)
+        result.append([n, record])
+    return result
+
+
+# Helper method for main. Yields the results of every group as they are
+# done, in the order they finish.
+def results(grouped, analyses, workers):
+    if workers == 1:
+        for group in grouped:
+            yield run(group, analyses)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(run, group, analyses) for group in grouped]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+# Helper method for main. Returns a function writing one record to `out` in
+# the given format.
+def writer(out, form):
+    if form == "jsonl":
+        def write(record):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+        return write
+    rows = csv.DictWriter(out, FIELDS, lineterminator="\n")
+    rows.writeheader()
+    def write(record):
+        row = dict(record, prefix=" ".join(record["prefix"]))
+        if record["histogram"] is not None:
+            row["histogram"] = " ".join("{}:{}".format(left, num) for left, num in record["histogram"].items())
+        rows.writerow(row)
+        out.flush()
+    return write
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Analyse many Peg Game positions without the interface")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[15], help="board sizes (default 15)")
+    parser.add_argument("--holes", nargs="+", default=["all"],
+                        help="names of the starting holes, or `all` (default all)")
+    parser.add_argument("--prefix", nargs="*", default=[], metavar="SRC-DEST",
+                        help="moves played from every starting hole, such as d-a f-d")
+    parser.add_argument("--analyses", nargs="+", choices=ANALYSES, default=list(ANALYSES),
+                        help="what to work out (default all of them)")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl",
+                        help="output format (default jsonl)")
+    parser.add_argument("--output", help="file to write results to (default stdout)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of processes (default one per CPU)")
+    parser.add_argument("--cache", action="store_true",
+                        help="create the persistent cache if there is none, so results carry over to later runs")
+    options = parser.parse_args(args)
+
+    prefix = []
+    for move in options.prefix:
+        if move.count("-") != 1:
+            parser.error("moves are written SRC-DEST, not {}".format(move))
+        prefix.append(move.split("-"))
+    if options.cache:
+        cache = open_cache(create=True)
+        if cache is not None:
+            cache.close()
+    workers = options.workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    batch = jobs(options.sizes, options.holes, prefix)
+    grouped = groups(batch)
+    workers = max(1, min(workers, len(grouped)))
+    out = sys.stdout if options.output is None else open(options.output, "w", newline="")
+    write = writer(out, options.format)
+    done, errors, busy = 0, 0, 0.0
+    try:
+        for result in results(grouped, options.analyses, workers):
+            for _, record in result:
+                write(record)
+                done += 1
+                errors += record["error"] is not None
+                busy += record["seconds"] or 0.0
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print("{} jobs ({} distinct positions, {} errors) in {:.2f}s with {} workers: "
+          "{:.1f} jobs/s, {:.2f}s of work per job, {:.1f}x parallel speedup".format(
+              done, len(grouped) - errors, errors, elapsed, workers,
+              done / elapsed if elapsed else 0.0, busy / done if done else 0.0,
+              busy / elapsed if elapsed else 0.0), file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,261 @@
+#
+# Benchmarks for the search hot paths: triangle(), hop_peg()/rewind(), hint()
+#   and solve(), across board sizes, starting holes and mid-game positions.
+#   Runs headless, without the `interface` module.
+#
+# Usage:
+#   python bench.py                          run and print the results
+#   python bench.py --save baseline.json     ... and save them as a baseline
+#   python bench.py --compare baseline.json  ... and flag regressions
+#
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from board import pegboard, triangle
+from stats import SearchStats
+import vectorized
+
+SIZES = (15, 21, 28, 36, 33, 37)
+
+# Fraction by which a case may get slower than its baseline before it is
+# flagged, and the smallest slowdown (in seconds) worth flagging at all.
+THRESHOLD = 0.25
+NOISE = 0.005
+
+# Minimum number of seconds each repeated case is run for
+MIN_TIME = 0.2
+
+# Number of pegs the mid-game positions of each size are played down to, so
+# that hint() and solve() finish in seconds
+PEGS = { 15: 14, 21: 16, 28: 16, 36: 15 }
+
+# Starting holes of the cross boards, on which only hint() is benchmarked,
+# from the start: solving them depth first is out of reach
+CROSS_STARTS = { 33: ("a", "e", "i") }
+
+# Starting holes of the cross boards from which a hint is also given with the
+# time budget the interface gives it, and that budget in seconds
+BUDGET_STARTS = { 33: ("a", "e", "i", "q"), 37: ("a", "s") }
+HINT_BUDGET = 5.0
+
+# Number of boards kept alive at once by the boards case, whose peak memory
+# is then about the bytes per live game in KB
+BOARDS = 1000
+
+
+# Return a board of the given size with hole `start` empty and `moves` moves
+# played. Moves are picked by a random generator seeded from the arguments, so
+# the same position is produced on every run.
+#
+# size  ->  number of holes
+# start ->  index of the empty hole
+# moves ->  number of moves to play
+def position(size, start, moves):
+    board = pegboard(size)
+    board.endgame = None    # measure the search, not the table or cache lookup
+    board.cache = None
+    board.remove_peg(board.holes[start])
+    rng = random.Random(size * 1000 + start)
+    for _ in range(moves):
+        legal = board.legal_moves()
+        if not legal:
+            break
+        board.hop_peg(*rng.choice(legal))
+    return board
+
+
+# Return the starting holes benchmarked for a board: a corner, the middle of
+# an edge and the hole nearest the center.
+#
+# board ->  the pegboard
+def starts(board):
+    rows = board.num_rows
+    edge = (rows // 2) * (rows // 2 + 1) // 2
+    center = (2 * rows // 3) * (2 * rows // 3 + 1) // 2 + rows // 3
+    return sorted({ 0, edge, center })
+
+
+# Return every case to run as (name, size, setup, run). setup() returns a
+# fresh object to measure and run(obj) returns the number of nodes searched:
+# hops for hop_rewind, boards built for triangle and boards, positions
+# visited (SearchStats.nodes) for hint, budget and solve, and boards in every
+# layer for layers (the NumPy solve, only run when NumPy is installed).
+#
+# sizes ->  board sizes to benchmark
+def cases(sizes):
+    result = []
+    for size in sizes:
+        if size in BUDGET_STARTS:
+            board = pegboard(size)
+            for start in CROSS_STARTS.get(size, ()):
+                setup = lambda size=size, start=board.hole(start).index: position(size, start, 0)
+                result.append(("hint/{}/{}".format(size, start), size, setup,
+                               hint))
+            for start in BUDGET_STARTS[size]:
+                setup = lambda size=size, start=board.hole(start).index: position(size, start, 0)
+                result.append(("budget/{}/{}".format(size, start), size, setup,
+                               hint_in_budget))
+            continue
+        result.append(("triangle/{}".format(size), size,
+                       lambda size=size: size,
+                       lambda size: triangle(size) and 1))
+        result.append(("boards/{}".format(size), size,
+                       lambda size=size: size,
+                       lambda size: len([triangle(size) for _ in range(BOARDS)])))
+        result.append(("hop_rewind/{}".format(size), size,
+                       lambda size=size: position(size, 0, 0),
+                       hop_rewind))
+        board = triangle(size)
+        for start in starts(board):
+            moves = size - 1 - PEGS[size]
+            name = "{}/{}".format(size, board.holes[start].name)
+            if moves:
+                name += "+{}".format(moves)
+            setup = lambda size=size, start=start, moves=moves: position(size, start, moves)
+            result.append(("hint/" + name, size, setup, hint))
+            result.append(("solve/" + name, size, setup, solve))
+            if vectorized.available():
+                result.append(("layers/" + name, size, setup, layers))
+    return result
+
+
+# Find a hint for a board. Returns the number of positions visited.
+def hint(board):
+    board.instrument = True
+    board.hint()
+    return board.last_stats.nodes
+
+
+# Find a hint for a board within HINT_BUDGET seconds, as the interface does.
+# Returns the number of positions visited.
+def hint_in_budget(board):
+    board.instrument = True
+    board.hint(budget=HINT_BUDGET)
+    return board.last_stats.nodes
+
+
+# Solve a board depth first. Returns the number of positions visited.
+def solve(board):
+    board.instrument = True
+    board.solve(vectorize=False)
+    return board.last_stats.nodes
+
+
+# Solve a board layer by layer. Returns the number of boards in every layer.
+def layers(board):
+    stats = SearchStats("solve", board.pegs_left)
+    vectorized.solve(board.engine, board.state, board.pegs_left, stats)
+    return stats.nodes
+
+
+# Hop the first legal peg and rewind it, over and over. Returns the number of
+# hops made.
+def hop_rewind(board, count=2000):
+    h, i, j = board.legal_moves()[0]
+    for _ in range(count):
+        board.hop_peg(h, i, j)
+        board.rewind()
+    return count
+
+
+# Return the measurements of one case as a dictionary. Quick cases are
+# repeated until they have run for MIN_TIME seconds.
+#
+# memory    ->  whether to run the case again under tracemalloc to find its
+#                   peak memory use
+def measure(name, setup, run, memory=True):
+    wall, nodes, runs = 0.0, 0, 0
+    while wall < MIN_TIME or runs == 0:
+        obj = setup()
+        start = time.perf_counter()
+        nodes += run(obj)
+        wall += time.perf_counter() - start
+        runs += 1
+        if wall > MIN_TIME / 4 and runs == 1:
+            break   # slow enough to time once
+    result = {
+        "name": name,
+        "wall": wall / runs,
+        "nodes": nodes // runs,
+        "nodes_per_sec": nodes / wall if wall else 0.0,
+    }
+    if memory:
+        obj = setup()
+        tracemalloc.start()
+        run(obj)
+        result["peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    return result
+
+
+# Return the names of the cases that got slower than their baseline, with a
+# message for each.
+#
+# results   ->  array of measurements
+# baseline  ->  array of measurements to compare against
+# threshold ->  fraction by which a case may get slower
+def compare(results, baseline, threshold=THRESHOLD):
+    before = { result["name"]: result for result in baseline }
+    regressions = []
+    for result in results:
+        old = before.get(result["name"])
+        if old is None:
+            continue
+        if result["wall"] > old["wall"] * (1 + threshold) and result["wall"] - old["wall"] > NOISE:
+            regressions.append("{}: {:.4f}s -> {:.4f}s ({:+.0f}%)".format(
+                result["name"], old["wall"], result["wall"],
+                100 * (result["wall"] / old["wall"] - 1)))
+    return regressions
+
+
+def report(result):
+    line = "{:<24} {:>10.4f}s {:>10} nodes {:>12.0f} nodes/s".format(
+        result["name"], result["wall"], result["nodes"], result["nodes_per_sec"])
+    if "peak_kb" in result:
+        line += " {:>9} KB".format(result["peak_kb"])
+    print(line, flush=True)
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Benchmark the Peg Game search hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), choices=SIZES)
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--no-memory", action="store_true", help="skip peak memory measurement")
+    parser.add_argument("--save", metavar="FILE", help="save the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="flag regressions against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    options = parser.parse_args(args)
+
+    if vectorized.available():
+        import numpy    # so that the first layers case does not time the import
+
+    results = []
+    for name, size, setup, run in cases(options.sizes):
+        if options.filter in name:
+            results.append(measure(name, setup, run, not options.no_memory))
+            report(results[-1])
+
+    if options.save:
+        with open(options.save, "w") as file:
+            json.dump({ "python": sys.version.split()[0], "results": results }, file, indent=2)
+        print("Saved baseline to {}".format(options.save))
+
+    if options.compare:
+        with open(options.compare) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, options.threshold)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            return 1
+        print("No regressions beyond {:.0f}%".format(100 * options.threshold))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
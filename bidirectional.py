@@ -0,0 +1,154 @@
+#
+# A bidirectional (meet-in-the-middle) solvability search. Answers whether a
+#   board can still be won, and by which move, without searching every game
+#   to its end. One frontier is grown forward from the board by hops, the
+#   other backward from every winning single-peg board by unjumps (a hop played
+#   in reverse: a peg in hole j jumps back over empty hole i to empty hole h,
+#   leaving pegs in both). Each frontier holds every board at one peg count,
+#   and the smaller of the two is grown next, until both reach the same count.
+#   The board can be won exactly when the two frontiers share a board.
+#
+#   Both frontiers are pruned with the invariants of bounds.py: forward boards
+#   that can not end with a single peg are dropped, and so are backward boards
+#   no game from the starting board can get to, being of another parity class
+#   or holding more pegs in some pagoda set than the starting board does.
+#
+#   Both frontiers hold one board per class of boards equal up to rotation and
+#   reflection (see Engine.key), as a board can be won exactly when its images
+#   can. A backward board is kept when any of its images could be reached.
+#
+#   Every board of a frontier is kept, so the search pays off on boards that
+#   can not be won: proving that takes hint() every game, while the frontiers
+#   stay far smaller. A board that can be won is usually found won much faster
+#   by hint(), which stops at the first winning game it comes across.
+#
+
+from contextlib import nullcontext as _nothing
+
+# Return [winnable, move]. winnable is whether a single peg can be left on the
+# board, and move is the index of the first move (in table order) that still
+# allows it, the same move Engine.hint() gives for a board that can be won.
+# move is None when the board can not be won or is already won.
+#
+# engine    ->  Engine of the board
+# bounds    ->  Bounds of the board
+# state     ->  the packed board
+# pegs      ->  number of pegs on the board
+# stats     ->  SearchStats to count into, or None. Each frontier is timed as
+#                   its own phase
+def winnable(engine, bounds, state, pegs, stats=None):
+    if stats is not None:
+        stats.node(pegs)
+    if pegs == 1:
+        return [True, None]
+    if bounds.lower(state, pegs) > 1:
+        return [False, None]
+
+    # forward frontier: key of a board -> [board, first move leading to it or
+    # any of its images]
+    ahead = dict()
+    for k in engine.legal_moves(state):
+        child = state ^ engine.table[k][2]
+        key = engine.key(child)
+        if key not in ahead and bounds.lower(child, pegs - 1) == 1:
+            ahead[key] = [child, k]
+    if stats is not None:
+        stats.nodes += len(ahead)
+    forward = pegs - 1
+
+    # backward frontier: keys of single pegs in a hole the board can still get
+    # a peg into
+    limits = [(mask, (state & mask).bit_count()) for mask in set(bounds.pagodas)]
+    sig = bounds.signature(state)
+    behind = { engine.key(1 << t) for t in range(engine.size)
+               if _reachable(engine, bounds, 1 << t, sig, limits) }
+    backward = 1
+
+    while forward > backward and ahead and behind:
+        if len(ahead) <= len(behind):
+            with stats.phase("forward") if stats is not None else _nothing():
+                ahead = _forward(engine, bounds, ahead, forward, stats)
+            forward -= 1
+        else:
+            with stats.phase("backward") if stats is not None else _nothing():
+                behind = _backward(engine, bounds, behind, sig, limits, stats)
+            backward += 1
+
+    met = [ahead[key][1] for key in behind if key in ahead]
+    if not met:
+        return [False, None]
+    return [True, min(met)]
+
+
+# Helper method for winnable. Returns the boards one hop away from the boards
+# in `ahead`, by key, each mapped to [board, first] where first is the
+# smallest first move of any board leading to one of its images. Drops the
+# boards that can no longer be won.
+def _forward(engine, bounds, ahead, pegs, stats):
+    result = dict()
+    for state, first in ahead.values():
+        if 2 * pegs > engine.size:
+            bits, groups = engine.full ^ state, engine.by_j
+        else:
+            bits, groups = state, engine.by_h
+        while bits:
+            low = bits & -bits
+            bits ^= low
+            for mask, need, flip in groups[low.bit_length() - 1]:
+                if state & mask == need:
+                    child = state ^ flip
+                    key = engine.key(child)
+                    known = result.get(key)
+                    if known is None:
+                        if bounds.lower(child, pegs - 1) == 1:
+                            result[key] = [child, first]
+                    elif first < known[1]:
+                        known[1] = first
+    if stats is not None:
+        stats.nodes += len(result)
+        stats.lowest = min(stats.lowest, pegs - 1)
+    return result
+
+
+# Helper method for winnable. Returns the keys of the boards one unjump away
+# from the boards in `behind` that could be reached from the board searched
+# from (see _reachable).
+def _backward(engine, bounds, behind, sig, limits, stats):
+    result = set()
+    for state in behind:
+        bits = state
+        while bits:
+            low = bits & -bits
+            bits ^= low
+            for mask, need, flip in engine.by_j[low.bit_length() - 1]:
+                if state & mask == low:     # peg in j, h and i empty
+                    key = engine.key(state ^ flip)
+                    if key not in result and _reachable(engine, bounds, key, sig, limits):
+                        result.add(key)
+    if stats is not None:
+        stats.nodes += len(result)
+    return result
+
+
+# Helper method for winnable. Returns whether any image of `state` under the
+# symmetries of the board is in parity class `sig` and fits within `limits`,
+# as every board a game from the board searched from gets to is.
+def _reachable(engine, bounds, state, sig, limits):
+    if engine.symmetry is None:
+        return bounds.signature(state) == sig and _fits(state, limits)
+    for t in range(len(engine.symmetry)):
+        image = engine.symmetry.apply(t, state)
+        if bounds.signature(image) == sig and _fits(image, limits):
+            return True
+    return False
+
+
+# Helper method for _reachable. Returns whether `state` holds no more pegs in
+# any pagoda set than the board searched from.
+#
+# limits    ->  array of (mask, pegs) pairs, one per pagoda set
+def _fits(state, limits):
+    for mask, most in limits:
+        if (state & mask).bit_count() > most:
+            return False
+    return True
@@ -1,54 +1,146 @@
 #
-# An encapsulation of a pegboard. Only one pegboard is instantiated per game
+# An encapsulation of a pegboard. Only one pegboard is instantiated per game.
+#   Boards of the same size share their holes, move tables and bounds (see
+#   geometry.py), so a board only holds the state of its own game.
 #
+#   The search engines, the NumPy solve, the worker pools and the persistent
+#   cache are imported by the methods that use them, the first time one of
+#   them is called, so that starting a game only loads what playing it needs.
+#
+
+from contextlib import nullcontext
+
+import bounds
+import geometry
+from stats import Cancelled, SearchStats
+from table import TranspositionTable
+from turn import Log
 
-from hole import Hole
-from turn import Log, Node, Turn
+# Value of Board._endgame and Board._cache until they are first used
+UNOPENED = object()
 
 class Board:
 
+    __slots__ = ("geometry", "holes", "size", "num_rows", "pegs_left", "log", "engine",
+                 "table", "bounds", "hints", "_endgame", "_cache", "state", "legal",
+                 "instrument", "hooks", "last_stats", "cancel", "searching")
+
 
     # Constructor: Relies on static method triangle() to feed it the correct inputs
     #
+    # geometry  ->  The Geometry of the board, shared with every board of
+    #                   the same size. Nothing in it may be changed
     # holes     ->  An array of the holes of the board, already given proper 
     #                   adjacencies. Storing holes this way keeps iteration 
-    #                   simple. Holes should be named starting from ASCII 'a', 
-    #                   because that guarantees array lookups happen in 
-    #                   constant time.
+    #                   simple. Holes are named from ASCII 'a' in index order
+    #                   (see geometry.hole_name) and looked up by name through
+    #                   the geometry. Shared, so whether a hole holds a peg
+    #                   is kept in `state` rather than in the hole
     # size      ->  len(holes) set as a class attribute during initialization 
     #                   for convenience.
-    # num_rows  ->  Can be derived from hole size, also calculated ahead of 
-    #                   time for convenience.
+    # num_rows  ->  Number of rows the board is printed on, calculated ahead
+    #                   of time for convenience.
     # pegs_left ->  Keep track of progress through the game, decremented 
     #                   whenever the player makes a move.
-    # log       ->  Doubly-linked list containing every turn made so far. Meant
-    #                   for playback of a game and to enable recursive "solver" 
-    #                   and "hint-giver" functions
-    def __init__(self, holes, size, num_rows):
-        self.holes = holes
-        self.size = size
-        self.num_rows = num_rows
+    # log       ->  Stack of every move made so far, stored compactly. Meant
+    #                   for playback of a game and to enable rewind()
+    # engine    ->  Bitboard move tables compiled from the adjacencies of 
+    #                   `holes`, along with the symmetries of the board. Does
+    #                   the heavy lifting for hint() and solve(). Shared
+    # table     ->  TranspositionTable of outcome histograms found by solve().
+    #                   Kept for the whole game, since later positions are
+    #                   often reached again. Replace it to change its size cap
+    #                   or eviction policy
+    # bounds    ->  Lower bounds on the pegs that can be left, used to prune
+    #                   the search behind hint(). Shared
+    # hints     ->  TranspositionTable of results found by hint(), kept for
+    #                   the whole game like `table`
+    # endgame   ->  EndgameTable for boards of this size, memory-mapped from
+    #                   disk, or None if none has been built (see endgame.py).
+    #                   Opened on first use, and shared
+    # cache     ->  SolveCache of hints and solves shared with other sessions
+    #                   and processes, or None if none has been created (see
+    #                   cache.py). One connection is shared by every board of
+    #                   a process, opened on first use. Set either to None to
+    #                   do without it
+    # state     ->  The occupation of every hole packed into an int: bit k is
+    #                   set when hole k holds a peg. Changed by hop_peg(),
+    #                   rewind() and remove_peg() only
+    # legal     ->  Bit vector of the moves that can be made right now, bit k
+    #                   standing for move k of engine.moves. Only the moves
+    #                   touching the holes a move changes are checked again
+    #                   after it
+    # instrument -> Whether hint() and solve() count what they do into a
+    #                   SearchStats. Off by default, as counting slows them
+    #                   down slightly
+    # hooks     ->  Functions called with the SearchStats of every
+    #                   instrumented search once it is done
+    # last_stats -> SearchStats of the last instrumented search, or None
+    # cancel    ->  threading.Event that stops hint() and solve() early once
+    #                   set, so they can run in a worker thread (see
+    #                   interface.py). None if they always run to the end
+    # searching ->  SearchStats of the search running right now, or None.
+    #                   Counted into live, for progress displays
+    def __init__(self, geometry):
+        self.geometry = geometry
+        self.holes = geometry.holes
+        self.size = geometry.size
+        self.num_rows = geometry.num_rows
         self.pegs_left = self.size - 1
-        self.log = Log()
-
-
-    # A getter for holes. Hides ugly code from the method caller
+        self.engine = geometry.engine
+        self.log = Log(self)
+        self.table = TranspositionTable()
+        self.bounds = geometry.bounds
+        self.hints = TranspositionTable()
+        self._endgame = UNOPENED
+        self._cache = UNOPENED
+        self.state = self.engine.full
+        self.legal = 0
+        for k in self.engine.legal_moves(self.state):
+            self.legal |= 1 << k
+        self.instrument = False
+        self.hooks = []
+        self.last_stats = None
+        self.cancel = None
+        self.searching = None
+
+
+    @property
+    def endgame(self):
+        if self._endgame is UNOPENED:
+            self._endgame = self.geometry.endgame
+        return self._endgame
+
+
+    @endgame.setter
+    def endgame(self, endgame):
+        self._endgame = endgame
+
+
+    @property
+    def cache(self):
+        if self._cache is UNOPENED:
+            from cache import shared_cache
+            self._cache = shared_cache()
+        return self._cache
+
+
+    @cache.setter
+    def cache(self, cache):
+        self._cache = cache
+
+
+    # A getter for holes. Hides ugly code from the method caller. Returns None
+    # if no hole has that name.
     # 
-    # name  ->  char containing the name of the hole
+    # name  ->  string containing the name of the hole (see geometry.hole_name)
     def hole(self, name):
-        if (name is None or
-            len(name) > 1 or 
-            ord(name) - 97 >= self.size or
-            ord(name) <= 96
-        ):
-            return None
-        
-        return self.holes[ord(name) - 97]
+        return self.geometry.names.get(name)
 
 
     # Visualize the occupation of pegs on the board.
     def __str__(self):
-        return self.show_board(list(map(lambda hole: "\u257F" if hole.has_peg else "\u25CB", self.holes)))
+        return self.show_board(list(map(lambda hole: "\u257F" if self.has_peg(hole) else "\u25CB", self.holes)))
 
 
     # Visualize the names of each hole on the board.
@@ -57,102 +149,347 @@ class Board:
 
 
     # Helper method for __str__ and show_names.
-    # Print the array in the shape of a triangular pegboard
+    # Print the array in the shape of the pegboard
     # leave the decision-making regarding what to print to the other
     # methods.
     # 
     # arr   ->  Array of values to print
     def show_board(self, arr):
-        result = ""
-        num, i = 0, 0
-        while num < len(arr):
-            for _ in range(self.num_rows - i):
-                result += " "
-            for j in range(num, num + i + 1):
-                result += "{} ".format(arr[j])
-            result += "\n"
-            num += i + 1
-            i += 1
-        return result[:-1]  # remove the last newline
+        return self.geometry.show(arr)
+
+
+    # Return whether hole h holds a peg.
+    def has_peg(self, h):
+        return self.state >> h.index & 1 == 1
 
 
     # Return whether a move is possible after this one. Used to determine
     # whether the game should end and results should be displayed.
     def check_possible_moves(self):
-        for h in self.holes:
-            if h.has_peg:
-                for j, i in h.adj_holes.items():
-                    # is a hop from hole h over hole i to hole j possible?
-                    if self.hop_peg(h, i, j):
-                        self.rewind()
-                        return True
-        return False
+        return self.has_moves()
+
+
+    # Return whether any move can be made. Constant time.
+    def has_moves(self):
+        return self.legal != 0
+
+
+    # Return every move that can be made as an array of (h, i, j) hole
+    # triples, in the order hint() and solve() try them. Only the set bits of
+    # the legal mask are visited, so this takes time in the number of legal
+    # moves rather than the number of moves of the board.
+    def legal_moves(self):
+        legal, moves, holes, result = self.legal, self.engine.moves, self.holes, []
+        while legal:
+            low = legal & -legal
+            legal ^= low
+            h, i, j = moves[low.bit_length() - 1]
+            result.append((holes[h], holes[i], holes[j]))
+        return result
+
+
+    # Take the peg out of a hole, such as the one that starts the game empty.
+    #
+    # h ->  hole to empty
+    def remove_peg(self, h):
+        if self.has_peg(h):
+            self.state ^= 1 << h.index
+            self.update_legal((h.index,))
+
+
+    # Helper method for hop_peg, rewind and remove_peg. Check again the
+    # legality of every move touching the given holes.
+    #
+    # changed   ->  indices of the holes that gained or lost a peg
+    def update_legal(self, changed):
+        engine, state, legal = self.engine, self.state, self.legal
+        for index in changed:
+            for move in engine.touching[index]:
+                if engine.is_legal(state, move):
+                    legal |= 1 << move
+                else:
+                    legal &= ~(1 << move)
+        self.legal = legal
 
 
     # Find 1 move that could lead to a win (1 peg left) and return the move to 
-    # the user. If no win is possible, find move which could lead to the least
-    # amount of pegs left on the board on game completion.
+    # the user. If no win is possible, find the first move which could lead to
+    # the least amount of pegs left on the board on game completion.
     #
-    # best_case ->  A "best-case scenario" number of pegs left on the board
+    # best_case ->  A "best-case scenario" number of pegs left on the board.
+    #                   Kept for compatibility, it is always recalculated
     # l         ->  The hole from which the player should move the peg
     # m         ->  The hole to which the player should move the peg
-    def hint(self, best_case, l, m):
-        best_case = self.pegs_left  # save best-case scenario in case there a
-        # base case (if won, return)
-        if self.win():
-            return [best_case, l, m]
-        for h in self.holes:
-            if h.has_peg:
-                for j, i in h.adj_holes.items():
-                    if self.hop_peg(h, i, j):
-                        if self.pegs_left < best_case:
-                            best_case = self.pegs_left
-                        l, m = h, j
-                        result = self.hint(best_case, l, m)
-                        if result[0] < best_case:
-                            best_case = result[0]
-                        self.rewind()
-                        # if win state, exit loop early. We're done
-                        if best_case == 1:
-                            return [best_case, h, j]
-                        else:
-                            if result[0] < best_case:
-                                l, m = h, j
-        return [best_case, l, m] # winning is not possible if reached this point
-
-
-    # Return a dictionary of log objects, each one representing a unique 
-    # outcome of this game, organized by the number of pegs left at the end of 
-    # the game. Used by `solve` to display statistics about the current state 
-    # of the game. If someone wanted to implement this feature, it would be 
-    # possible to replay each outcome turn-by-turn using the return value of
-    # this function. 
-    def solve(self):
-
-        # number of games possible with x amount of pegs left
-        # compromising space for performance
-        logs = dict()
-
-        # base case: if game is over, return pegs_left
-        if not self.check_possible_moves():
-            if self.pegs_left in logs:
-                logs[self.pegs_left] += [self.log]
+    #
+    # workers   ->  Number of processes to search with, None for one per CPU
+    # budget    ->  Number of seconds to search for, None for no limit. When
+    #                   the time runs out, the best move found so far is
+    #                   returned (see anytime.py)
+    #
+    # Returns [best_case, l, m, proven], where proven tells whether best_case
+    # is known to be the fewest pegs that can be left. It is always True
+    # without a budget. l and m are returned untouched if no move can be made.
+    #
+    # With `cancel` set, a cancelled hint with a budget returns the best move
+    # found so far, as if the time ran out. Without a budget it raises
+    # Cancelled.
+    def hint(self, best_case=None, l=None, m=None, workers=1, budget=None):
+        state, stats = self.state, self.start_stats("hint")
+        result = None
+        if self.endgame is not None:
+            with self.phase(stats, "endgame table"):
+                result = self.endgame.lookup(state)
+        if result is None and self.cache is not None:
+            with self.phase(stats, "cache"):
+                cached = self.cache.lookup(self.engine, state)
+            if cached is not None and cached[0] is not None:
+                result = cached[:2]
+        if result is None:
+            with self.phase(stats, "search"), self.watch(stats, self.hints):
+                if budget is not None:
+                    import anytime
+                    result = anytime.hint(self.engine, self.bounds, state, self.pegs_left, budget,
+                                          self.hints, stats, self.cancel)
+                elif workers != 1:
+                    import parallel
+                    result = parallel.hint(self.engine, state, self.pegs_left, workers, stats=stats)
+                else:
+                    result = bounds.hint(self.engine, self.bounds, state, self.pegs_left, self.hints, stats)
+            if self.cache is not None and (len(result) < 3 or result[2]):
+                self.cache.store(self.engine, state, result[0], [result[1]] if result[1] is not None else [],
+                                 complete=result[1] is None)
+        self.report_stats(stats)
+        best_case, move = result[:2]
+        proven = result[2] if len(result) > 2 else True
+        if move is not None:
+            h, _, j = self.engine.moves[move]
+            l, m = self.holes[h], self.holes[j]
+        return [best_case, l, m, proven]
+
+
+    # Return [winnable, l, m], where winnable is whether a single peg can still
+    # be left on the board and l and m are the holes of the first move that
+    # keeps it possible, as hint() would give them. Searches forward from the
+    # board and backward from the won boards until the two meet (see
+    # bidirectional.py), which proves a board lost with fewer positions
+    # searched than hint() needs. It holds every board of both frontiers, so
+    # a board that can be won is usually answered far faster by hint(), and
+    # large boards (28 holes and up) are out of its reach. l and m are
+    # returned untouched if the board can not be won or is already won.
+    def winnable(self, l=None, m=None):
+        import bidirectional
+
+        stats = self.start_stats("winnable")
+        with self.phase(stats, "search"):
+            won, move = bidirectional.winnable(self.engine, self.bounds, self.state, self.pegs_left, stats)
+        self.report_stats(stats)
+        if move is not None:
+            h, _, j = self.engine.moves[move]
+            l, m = self.holes[h], self.holes[j]
+        return [won, l, m]
+
+
+    # Return a dictionary mapping a number of pegs left at the end of the
+    # game to the number of unique games from this point that end with that
+    # many pegs. Used by `solve` to display statistics about the current state
+    # of the game. Positions reached by different move orders are only worked
+    # out once, so memory grows with the number of distinct positions rather
+    # than the number of games.
+    #
+    # workers   ->  Number of processes to search with, None for one per CPU
+    # vectorize ->  Whether to solve layer by layer on NumPy arrays (see
+    #                   vectorized.py) rather than depth first. None to do so
+    #                   whenever NumPy is installed and the board has at most
+    #                   vectorized.BITS holes
+    #
+    # With `cancel` set, a depth-first solve is split into one search per
+    # position of the search frontier (see parallel.frontier), and a
+    # cancelled one returns the games through the positions it finished. The
+    # layered solve is still run in one pass, checked for cancellation once
+    # per layer, and a cancelled one returns the games ending in the layers
+    # it finished.
+    def solve(self, workers=1, vectorize=None):
+        import parallel
+        import vectorized
+
+        if vectorize is None:
+            vectorize = workers == 1 and self.size <= vectorized.BITS and vectorized.available()
+        stats = self.start_stats("solve")
+        if self.cache is not None:
+            with self.phase(stats, "cache"):
+                cached = self.cache.lookup(self.engine, self.state)
+            if cached is not None and cached[2] is not None:
+                if stats is not None:
+                    stats.done = 1.0
+                self.report_stats(stats)
+                return cached[2]
+
+        if vectorize:
+            search = lambda state, pegs: vectorized.solve(self.engine, state, pegs, stats)
+        elif workers != 1:
+            search = lambda state, pegs: parallel.solve(self.engine, state, pegs, workers, stats=stats)
+        else:
+            search = lambda state, pegs: self.engine.solve(state, pegs, self.table, stats)
+        with self.phase(stats, "search"), self.watch(stats, self.table):
+            if self.cancel is None:
+                counts, complete = search(self.state, self.pegs_left), True
+            elif vectorize:
+                try:
+                    counts, complete = search(self.state, self.pegs_left), True
+                except Cancelled as cancelled:
+                    counts, complete = cancelled.counts, False
             else:
-                logs[self.pegs_left] = [self.log] 
-            return logs
-
-        for h in self.holes:
-            if h.has_peg:
-                for j, i in h.adj_holes.items():
-                    if self.hop_peg(h, i, j):
-                        solve = self.solve()
-                        for key, item in solve.items():
-                            if key in logs:
-                                logs[key] += item
-                            else:
-                                logs[key] = item
-                        self.rewind()
-        return logs
+                counts, complete = self.solve_in_parts(search, stats)
+        if stats is not None and complete:
+            stats.done = 1.0
+        if self.cache is not None and complete:
+            self.cache.store(self.engine, self.state, counts=counts)
+        self.report_stats(stats)
+        return counts
+
+
+    # Helper method for solve. Solves every position a few moves away with
+    # search(state, pegs), one at a time, keeping stats.done up to date.
+    # Returns [counts, complete]. A cancelled solve stops at the first
+    # position it cuts short, and counts holds the games through the
+    # positions before it (and those ending before the frontier).
+    def solve_in_parts(self, search, stats):
+        import parallel
+
+        depth = min(parallel.DEPTH, max(0, self.pegs_left - 1))
+        try:
+            positions, counts = parallel.frontier(self.engine, self.state, self.pegs_left, depth, stats)
+        except Cancelled:
+            return [dict(), False]
+        for n, (state, paths) in enumerate(positions.values()):
+            try:
+                result = search(state, self.pegs_left - depth)
+            except Cancelled:
+                return [counts, False]
+            for left, num in result.items():
+                counts[left] = counts.get(left, 0) + num * paths
+            stats.done = (n + 1) / len(positions)
+        return [counts, True]
+
+
+    # Return an array with, for every move that can be made right now (in
+    # table order), [l, m, best_case, counts]: the holes of the move, the
+    # fewest pegs that can be left after it, and the histogram solve() would
+    # give after it. Positions reachable through several moves are only worked
+    # out once, so the whole analysis costs about as much as one solve: every
+    # move is solved in a single layered pass (see vectorized.analyze), or
+    # into the board's shared `table`.
+    #
+    # vectorize ->  Whether to use the layered pass. None to do so whenever
+    #                   NumPy is installed and the board has at most
+    #                   vectorized.BITS holes
+    #
+    # With `cancel` set, a cancelled analysis returns the moves it finished,
+    # which is none of them for the layered pass.
+    def analyze(self, vectorize=None):
+        import vectorized
+
+        if vectorize is None:
+            vectorize = self.size <= vectorized.BITS and vectorized.available()
+        stats = self.start_stats("analyze")
+        moves = self.engine.legal_moves(self.state)
+        result = []
+        if vectorize:
+            with self.phase(stats, "search"):
+                try:
+                    solved = vectorized.analyze(self.engine, self.state, self.pegs_left, stats)
+                except Cancelled:
+                    solved = []
+            for k, counts in solved:
+                h, _, j = self.engine.moves[k]
+                result.append([self.holes[h], self.holes[j], min(counts), counts])
+            self.report_stats(stats)
+            return result
+
+        with self.phase(stats, "search"), self.watch(stats, self.table):
+            for k in moves:
+                child = self.state ^ self.engine.table[k][2]
+                cached = self.cache.lookup(self.engine, child) if self.cache is not None else None
+                if cached is not None and cached[2] is not None:
+                    counts = cached[2]
+                else:
+                    try:
+                        counts = self.engine.solve(child, self.pegs_left - 1, self.table, stats)
+                    except Cancelled:
+                        break
+                    if self.cache is not None:
+                        self.cache.store(self.engine, child, counts=counts)
+                h, _, j = self.engine.moves[k]
+                result.append([self.holes[h], self.holes[j], min(counts), counts])
+                if stats is not None:
+                    stats.done = len(result) / len(moves)
+        self.report_stats(stats)
+        return result
+
+
+    # Return [counts, margins, games]: an estimate of what solve() returns,
+    # made from random games (see montecarlo.py), for boards too large to
+    # solve. counts maps a number of pegs left at the end of the game to the
+    # estimated number of unique games that end with that many pegs, margins
+    # maps it to the half-width of the 95% confidence interval of its share of
+    # the games, and games is the number of random games played.
+    #
+    # games     ->  Number of random games to play, None to play for `budget`
+    #                   seconds instead
+    # budget    ->  Number of seconds to play for, None for montecarlo.BUDGET
+    # seed      ->  Seed of the random games, None for a random one
+    # workers   ->  Number of processes to play with, None for one per CPU
+    #
+    # With `cancel` set, a cancelled estimate is made from the games already
+    # played.
+    def estimate(self, games=None, budget=None, seed=None, workers=1):
+        import montecarlo
+
+        if budget is None:
+            budget = montecarlo.BUDGET
+        stats = self.start_stats("estimate")
+        with self.phase(stats, "random games"):
+            result = montecarlo.estimate(self.engine, self.state, self.pegs_left, games, budget,
+                                         seed, workers, stats)
+        self.report_stats(stats)
+        return result
+
+
+    # Call `callback` with the SearchStats of every search from now on, and
+    # turn instrumentation on.
+    #
+    # callback  ->  function taking a SearchStats
+    def on_search(self, callback):
+        self.hooks.append(callback)
+        self.instrument = True
+
+
+    # Helper methods for hint and solve. Return a SearchStats for a search of
+    # the given kind, or None when it needs neither counting nor cancelling.
+    def start_stats(self, kind):
+        if not self.instrument and self.cancel is None:
+            return None
+        self.searching = SearchStats(kind, self.pegs_left, self.cancel)
+        return self.searching
+
+
+    # Time a phase of a search into `stats`, if there is one.
+    def phase(self, stats, name):
+        return stats.phase(name) if stats is not None else nullcontext()
+
+
+    # Count the lookups into `table` into `stats`, if there is one.
+    def watch(self, stats, table):
+        return stats.watch(table) if stats is not None else nullcontext()
+
+
+    # Keep the stats of a finished search and hand them to every hook.
+    def report_stats(self, stats):
+        self.searching = None
+        if stats is not None:
+            self.last_stats = stats
+            for hook in self.hooks:
+                hook(stats)
 
 
     # Check to see if the player won the game
@@ -173,26 +510,25 @@ class Board:
             raise "ERROR: hop_peg() was passed a null peg!"
 
         # check whether holes meet criteria for a hop
-        if h.has_peg == False or i.has_peg == False or j.has_peg:
+        if not self.has_peg(h) or not self.has_peg(i) or self.has_peg(j):
             return False
 
         # all criteria is met - hop is successful
-        h.has_peg = False
-        i.has_peg = False
-        j.has_peg = True
+        self.state ^= (1 << h.index) | (1 << i.index) | (1 << j.index)
+        self.update_legal((h.index, i.index, j.index))
         self.pegs_left -= 1
-        self.log.add(Turn(h, i, j, self.holes)) # record turn
+        self.log.add(self.engine.index[(h.index, i.index, j.index)]) # record turn
         return True
 
 
     # Set the board to the state it was in on the previous turn. Used for
     # recursive "hint generators" and "solvers".
     def rewind(self):
-        turn = self.log.pop()              # "pops" the last turn off Log
-        if turn is not None:    
-            turn.h.has_peg = True   
-            turn.i.has_peg = True
-            turn.j.has_peg = False
+        move = self.log.pop()              # "pops" the last move off Log
+        if move is not None:    
+            h, i, j = self.engine.moves[move]
+            self.state ^= self.engine.table[move][2]
+            self.update_legal((h, i, j))
             self.pegs_left += 1
 
 
@@ -204,51 +540,23 @@ class Board:
 # Return a triangular pegboard of a given size (recommended 15 or 21).
 # Feed the proper inputs into the constructor. The user should not call the
 # constructor directly, instead using this function or others like it to
-# generate the pegboard.
+# generate the pegboard. The holes and move tables are only built for the
+# first board of each size (see geometry.py).
 #
 # size  ->  Size of the to-be pegboard. Will be checked for validity
 def triangle(size):
-
-    # Initialize set N(n) = N(n - 1) + n, with  N(0) = 0 and N(n) < `size`
-    # (Example: [0, 1, 3, 6, 10] with `size` = 15)
-    # In other words, calculate valid sizes for trianglular board, and the 
-    # indexes at which a new row begins
-    nums = []
-    num, i = 0, 0
-    while num < size:
-        nums.append(num)
-        num += i + 1
-        i += 1
-
-    # check that size given forms a perfect triangular board
-    if num > size or size < 10 or size > 160:
+    shape = geometry.triangle(size)
+    if shape is None:
         print("Invalid pegboard size")
         return None  # will ask for size again if the one given is invalid
+    return Board(shape)
+
 
-    # array of holes, names in ascending order from ASCII lowercase a
-    holes = []
-    for i in range(size):
-        holes.append(Hole(chr(97 + i)))
-
-    # handle adjacencies - each iteration does this for one row
-    # will only add valid moves to avoid unnecessary checks
-    for new_left, old_left in zip(nums[1:], nums):
-        right = 2 * new_left - old_left
-        row_size = 1 + new_left - old_left
-        if new_left > 1:
-            # leftmost hole in a given row
-            holes[new_left].add_hole(holes[old_left], holes[new_left - 2 * row_size + 3])
-            # rightmost holes in a given row
-            holes[right].add_hole(holes[new_left - 1], holes[old_left - 1])
-            holes[right].add_hole(holes[right - 1], holes[right - 2])
-        # holes in the center
-        # k = index of current hole
-        for k in range(new_left + 1, right):
-            # size of the new row
-            if new_left > 3:
-                if k > new_left + 1:
-                    holes[k].add_hole(holes[k - row_size], holes[k - 2 * row_size + 1])
-                    holes[k].add_hole(holes[k - 1], holes[k - 2])
-                if k < right - 1:
-                    holes[k].add_hole(holes[k - row_size + 1], holes[k - 2 * row_size + 3])
-    return Board(holes, size, len(nums))
+# Return a pegboard of a given size: the English cross for 33, the European
+# cross for 37 and the triangle of that size otherwise (see geometry.py).
+#
+# size  ->  Size of the to-be pegboard. Will be checked for validity
+def pegboard(size):
+    if size in geometry.CROSSES:
+        return Board(geometry.cross(size))
+    return triangle(size)
@@ -0,0 +1,306 @@
+#
+# Lower bounds on the number of pegs that can be left on a board, and a
+#   branch-and-bound hint search built on them. Bounds are derived once per
+#   board from its move table:
+#
+#   parity  ->  Every move flips exactly three holes. Any set of holes that
+#                   shares an even number of holes with every move keeps the
+#                   parity of its peg count for the rest of the game. A few such
+#                   sets tell which peg counts can still be reached at all.
+#   pagoda  ->  A set of holes such that every move landing in it also takes a
+#                   peg out of it (a 0/1 pagoda function). The number of pegs
+#                   in the set never grows, so once it is empty the game can
+#                   not end with a single peg in it.
+#
+#   Among moves with the same bound, the search tries first those that draw
+#   the pegs in towards the middle of the board. Pegs left out on the edges
+#   are the hardest to take off later, and on larger boards such as the
+#   33-hole cross this finds a win many times sooner.
+#
+
+from table import TranspositionTable
+
+# Number of pegs up to which reachable peg counts are worked out per parity
+# class. Larger counts are never a useful bound.
+MAX_BOUND = 4
+
+class Bounds:
+
+
+    # Constructor: derived from the moves of an Engine.
+    #
+    # size      ->  number of holes on the board
+    # parity    ->  array of hole masks, a basis of the sets whose peg count
+    #                   keeps its parity on every move
+    # singles   ->  per hole, the parity class of a board with a single peg in
+    #                   that hole
+    # fewest    ->  dictionary mapping a parity class to the smallest number
+    #                   of pegs (up to MAX_BOUND) any board in it can have
+    # pagodas   ->  per hole, the mask of a pagoda set containing the hole.
+    #                   A single peg can only be left in hole t if the board
+    #                   has a peg in pagodas[t]
+    # targets   ->  per parity class, the union of pagodas[t] over every hole
+    #                   t a single peg of that class could be left in. A board
+    #                   with no peg in it can not be won
+    # order     ->  per move, the distance from the middle of the board (see
+    #                   distances()) of the hole it lands in, less those of
+    #                   the two holes it empties. The lower, the more it
+    #                   draws the pegs in
+    def __init__(self, engine):
+        self.size = engine.size
+        self.parity = parity_sets(engine)
+        self.singles = [self.signature(1 << t) for t in range(self.size)]
+
+        self.fewest = dict()
+        reached = { 0 }     # classes of boards with `pegs` pegs (or fewer)
+        for pegs in range(1, MAX_BOUND + 1):
+            reached = { sig ^ single for sig in reached for single in self.singles }
+            for sig in reached:
+                self.fewest.setdefault(sig, pegs)
+
+        self.pagodas = [pagoda_set(engine, t) for t in range(self.size)]
+        self.targets = dict()
+        for t, sig in enumerate(self.singles):
+            self.targets[sig] = self.targets.get(sig, 0) | self.pagodas[t]
+
+        away = distances(engine)
+        self.order = [away[j] - away[h] - away[i] for h, i, j in engine.moves]
+
+
+    # Return the parity class of a packed state, one bit per parity set.
+    #
+    # state ->  the packed board
+    def signature(self, state):
+        sig = 0
+        for bit, mask in enumerate(self.parity):
+            sig |= ((state & mask).bit_count() & 1) << bit
+        return sig
+
+
+    # Return a lower bound on the number of pegs left at the end of any game
+    # from `state`.
+    #
+    # state ->  the packed board
+    # pegs  ->  number of pegs on the board
+    def lower(self, state, pegs):
+        sig = self.signature(state)
+        fewest = self.fewest.get(sig, MAX_BOUND)
+        if fewest == 1 and not state & self.targets[sig]:
+            fewest = 2
+        return min(fewest, pegs)
+
+
+    # Return the boards one move away from `state`, in the order the search
+    # tries them: lowest lower bound first, then the moves drawing the pegs
+    # in the most.
+    #
+    # engine    ->  Engine of the board
+    # state     ->  the packed board
+    # pegs      ->  number of pegs on the board
+    def children(self, engine, state, pegs):
+        order = self.order
+        moves = [(self.lower(state ^ engine.table[k][2], pegs - 1), order[k], k)
+                 for k in engine.legal_moves(state)]
+        moves.sort()
+        return [state ^ engine.table[k][2] for _, _, k in moves]
+
+
+# ---------------------------------
+# STATIC FUNCTIONS BEYOND THIS POINT
+# ---------------------------------
+
+
+# Return a basis of the sets of holes (as masks) that share an even number of
+# holes with every move, found by Gaussian elimination over GF(2).
+#
+# engine    ->  Engine of the board
+def parity_sets(engine):
+
+    # reduce the moves to echelon form, keyed by leading bit
+    rows = dict()
+    for _, _, flip in engine.table:
+        while flip:
+            lead = flip.bit_length() - 1
+            if lead not in rows:
+                rows[lead] = flip
+                break
+            flip ^= rows[lead]
+
+    # fully reduce, so every leading bit appears in a single row
+    for lead in sorted(rows):
+        for other in rows:
+            if other != lead and rows[other] >> lead & 1:
+                rows[other] ^= rows[lead]
+
+    # one basis set per free bit
+    basis = []
+    for free in range(engine.size):
+        if free in rows:
+            continue
+        mask = 1 << free
+        for lead, row in rows.items():
+            if row >> free & 1:
+                mask |= 1 << lead
+        basis.append(mask)
+    return basis
+
+
+# Return, per hole, its distance from the middle of the board: the number of
+# steps between neighbouring holes to the nearest of the holes that are
+# fewest steps from every other hole.
+#
+# engine    ->  Engine of the board
+def distances(engine):
+    neighbours = [set() for _ in range(engine.size)]
+    for h, i, _ in engine.moves:
+        neighbours[h].add(i)
+        neighbours[i].add(h)
+
+    # steps from the nearest of `sources` to every hole, breadth first
+    def walk(sources):
+        away = [engine.size] * engine.size
+        for t in sources:
+            away[t] = 0
+        layer = list(sources)
+        while layer:
+            reached = []
+            for t in layer:
+                for n in neighbours[t]:
+                    if away[n] > away[t] + 1:
+                        away[n] = away[t] + 1
+                        reached.append(n)
+            layer = reached
+        return away
+
+    reach = [max(walk([t])) for t in range(engine.size)]
+    return walk([t for t in range(engine.size) if reach[t] == min(reach)])
+
+
+# Return the mask of a 0/1 pagoda set containing hole t: starting from t,
+# whenever a move lands in the set without taking a peg out of it, its
+# starting hole is added.
+#
+# engine    ->  Engine of the board
+# t         ->  index of the hole
+def pagoda_set(engine, t):
+    mask, grown = 1 << t, True
+    while grown:
+        grown = False
+        for h, i, j in engine.moves:
+            if mask >> j & 1 and not mask >> h & 1 and not mask >> i & 1:
+                mask |= 1 << h
+                grown = True
+    return mask
+
+
+# Return the same [best_case, move] as Engine.hint(), but skip every branch
+# that can not leave fewer pegs than the best found so far. Moves below the
+# root are tried in order of their lower bound, most promising first.
+#
+# engine    ->  Engine of the board
+# bounds    ->  Bounds of the board
+# state     ->  the packed board
+# pegs      ->  number of pegs on the board
+# table     ->  TranspositionTable of results already worked out, or None
+# stats     ->  SearchStats to count into, or None
+def hint(engine, bounds, state, pegs, table=None, stats=None):
+    if table is None:
+        table = TranspositionTable()
+    if stats is not None:
+        stats.node(pegs)
+    best_case, move = pegs, None
+    if pegs == 1:
+        return [best_case, move]
+    floor = bounds.lower(state, pegs)
+    moves = engine.legal_moves(state)
+    for n, k in enumerate(moves):
+        limit = pegs if move is None else best_case
+        if stats is not None:
+            stats.hops += 1
+        result = _search(engine, bounds, state ^ engine.table[k][2], pegs - 1, limit, table, stats)
+        if stats is not None:
+            stats.rewinds += 1
+        if move is None or result < best_case:
+            best_case, move = result, k
+            if best_case <= floor:
+                if stats is not None:
+                    stats.pruned += len(moves) - n - 1
+                break
+    return [best_case, move]
+
+
+# Return whether a single peg can be left from `state`. Shares `table` with
+# hint(), so asking about the children of a position hint() has searched
+# costs next to nothing.
+#
+# engine    ->  Engine of the board
+# bounds    ->  Bounds of the board
+# state     ->  the packed board
+# pegs      ->  number of pegs on the board
+# table     ->  TranspositionTable of results, a new one by default
+# stats     ->  SearchStats to count into, or None
+def can_win(engine, bounds, state, pegs, table=None, stats=None):
+    if table is None:
+        table = TranspositionTable()
+    return _search(engine, bounds, state, pegs, 2, table, stats) == 1
+
+
+# Helper method for hint. Returns the smallest number of pegs that can be
+# left from `state` if it is below `limit`. Otherwise returns a lower bound
+# on it that is at least `limit`.
+#
+# Results are stored as [value, exact]. An inexact value is a lower bound.
+#
+# clock ->  anytime.Clock that every position is counted against and told
+#               the peg count of every game end reached, or None. Its tick()
+#               stops the search by raising once the time is up
+def _search(engine, bounds, state, pegs, limit, table, stats, clock=None):
+    if stats is not None:
+        stats.node(pegs)
+    if clock is not None:
+        clock.tick()
+    if pegs == 1:
+        if clock is not None:
+            clock.reached(1)
+        return 1
+    key = engine.key(state)
+    entry = table.get(key)
+    if entry is not None:
+        value, exact = entry
+        if exact and clock is not None:
+            clock.reached(value)
+        if exact or value >= limit:
+            return value
+        floor = value
+    else:
+        floor = bounds.lower(state, pegs)
+        if floor >= limit:
+            if stats is not None:
+                stats.pruned += 1
+            table.put(key, (floor, False))
+            return floor
+
+    children = bounds.children(engine, state, pegs)
+    if not children:
+        if stats is not None:
+            stats.leaves += 1
+        table.put(key, (pegs, True))
+        if clock is not None:
+            clock.reached(pegs)
+        return pegs
+
+    best_case = pegs
+    for n, child in enumerate(children):
+        if stats is not None:
+            stats.hops += 1
+        result = _search(engine, bounds, child, pegs - 1, min(limit, best_case), table, stats, clock)
+        if stats is not None:
+            stats.rewinds += 1
+        if result < best_case:
+            best_case = result
+            if best_case <= floor:
+                if stats is not None:
+                    stats.pruned += len(children) - n - 1
+                break
+    table.put(key, (best_case, best_case < limit))
+    return best_case
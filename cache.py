@@ -0,0 +1,383 @@
+#
+# A persistent cache of search results, shared between sessions and between
+#   processes. Every game starts from one of a handful of positions, so the
+#   same hints and solves come up again and again. Results are kept in an
+#   SQLite database on local disk, in write-ahead log mode so that several
+#   processes can read it while one writes.
+#
+# Positions are keyed by board geometry (the size and move table of the
+#   board, as in endgame.header_for()) and canonical state, so rotations and
+#   reflections of a position share an entry. Moves are stored as seen from
+#   the canonical state and turned back to match the position asked about.
+#   Board.hint() gives the first move in table order that leaves the best
+#   case, which depends on the orientation of the position. warm() stores
+#   every such move, so the first of them can be given for any orientation.
+#   Board.hint() and the ponderer only find one of them, so their move is
+#   only given back for the very orientation it was found for, and a hint
+#   from the cache is always the one an uncached hint() would give.
+#
+# The cache is only used once it exists: `python cache.py warm` creates it and
+#   fills it in for every starting hole.
+#
+# Usage: python cache.py warm [size ...]   (default 15 21)
+#        python cache.py info
+#        python cache.py clear
+#        python cache.py check
+#
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from endgame import TABLE_DIR, header_for
+from table import TranspositionTable
+
+# Format of the database. A database written in any other format is emptied
+# when opened, as its entries can not be trusted.
+VERSION = 2
+
+# Default number of positions kept before the least recently used are evicted
+CAPACITY = 1 << 20
+
+# Number of stores between two checks of the capacity
+CHECK_EVERY = 256
+
+# Number of seconds to wait for another process to finish writing
+TIMEOUT = 5.0
+
+# Where the cache is kept by default
+PATH = os.path.join(TABLE_DIR, "cache.sqlite")
+
+# [pid, cache] of the cache returned by shared_cache() in this process
+_shared = [None, None]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key     TEXT PRIMARY KEY,
+    value   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    geometry    TEXT NOT NULL,
+    state       TEXT NOT NULL,
+    best        INTEGER,
+    moves       TEXT,
+    source      INTEGER,
+    counts      TEXT,
+    used        REAL NOT NULL,
+    PRIMARY KEY (geometry, state)
+);
+CREATE INDEX IF NOT EXISTS positions_used ON positions (used);
+"""
+
+class SolveCache:
+
+
+    # Constructor: use open_cache() rather than calling this directly.
+    #
+    # connection    ->  sqlite3 connection to the database
+    # path          ->  path of the database file
+    # capacity      ->  maximum number of positions kept, over every geometry
+    # lock          ->  serializes use of the connection, which may be shared
+    #                       between threads
+    # stores        ->  number of stores since the capacity was last checked
+    # frames        ->  dictionary mapping an Engine to its geometry key and,
+    #                       per symmetry, the move permutations into and out
+    #                       of the canonical frame
+    def __init__(self, connection, path, capacity=CAPACITY):
+        self.connection = connection
+        self.path = path
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.stores = 0
+        self.frames = dict()
+
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+
+
+    # Return [best_case, move, counts] for `state`, or None if nothing is
+    # cached for it. best_case and move are as Board.hint() gives them (move
+    # being an index into engine.moves) and are None if no hint is cached for
+    # this orientation of the position. counts is the histogram of
+    # Engine.solve(), or None.
+    #
+    # engine    ->  Engine of the board
+    # state     ->  the packed board
+    def lookup(self, engine, state):
+        geometry, canon, _, out_of, t = self.frame(engine, state)
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT best, moves, source, counts FROM positions WHERE geometry = ? AND state = ?",
+                (geometry, canon)).fetchone()
+            if row is None:
+                return None
+            with self.connection:
+                self.connection.execute(
+                    "UPDATE positions SET used = ? WHERE geometry = ? AND state = ?",
+                    (time.time(), geometry, canon))
+        best_case, moves, source, counts = row
+        move = None
+        if source is not None and source != t:
+            best_case = None    # only the first move of another orientation is known
+        elif moves is not None and int(moves, 16):
+            moves = int(moves, 16)
+            move = min(out_of[k] for k in range(moves.bit_length()) if moves >> k & 1)
+        if counts is not None:
+            counts = { int(left): num for left, num in json.loads(counts).items() }
+        return [best_case, move, counts]
+
+
+    # Store what is known about `state`. Arguments left as None keep what is
+    # already cached.
+    #
+    # engine    ->  Engine of the board
+    # state     ->  the packed board
+    # best_case ->  fewest pegs that can be left, as Board.hint() gives it
+    # moves     ->  indices of moves leaving best_case, empty if there are
+    #                   none
+    # complete  ->  whether `moves` holds every move leaving best_case. If
+    #                   not, moves[0] must be the first of them in table
+    #                   order, as Board.hint() gives it, and is only given
+    #                   back for `state` itself
+    # counts    ->  histogram of Engine.solve()
+    def store(self, engine, state, best_case=None, moves=(), counts=None, complete=False):
+        geometry, canon, into, _, t = self.frame(engine, state)
+        mask = 0
+        for k in moves:
+            mask |= 1 << into[k]
+        source = None if complete or best_case is None else t
+        if counts is not None:
+            counts = json.dumps({ str(left): num for left, num in counts.items() })
+        with self.lock:
+            with self.connection:
+                row = self.connection.execute(
+                    "SELECT best, moves, source, counts FROM positions WHERE geometry = ? AND state = ?",
+                    (geometry, canon)).fetchone()
+                if row is not None:
+                    if best_case is None or (best_case == row[0] and not complete and row[2] != t):
+                        # keep the cached moves: every one of them, or
+                        # those of another orientation
+                        best_case, mask, source = row[0], int(row[1] or "0", 16), row[2]
+                    if counts is None:
+                        counts = row[3]
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO positions (geometry, state, best, moves, source, counts, used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (geometry, canon, best_case, format(mask, "x") if mask else None, source, counts,
+                     time.time()))
+            self.stores += 1
+            if self.stores >= CHECK_EVERY:
+                self.stores = 0
+                self.evict()
+
+
+    # Evict the least recently used positions until the cache is within its
+    # capacity. The lock must be held.
+    def evict(self):
+        count = self.connection.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+        if count > self.capacity:
+            with self.connection:
+                self.connection.execute(
+                    "DELETE FROM positions WHERE rowid IN "
+                    "(SELECT rowid FROM positions ORDER BY used LIMIT ?)",
+                    (count - self.capacity,))
+
+
+    # Return [geometry, canon, into, out_of, t] for `state`: the geometry key
+    # of the board, the canonical state (as text, since it may not fit in a
+    # 64-bit SQLite integer), the move permutations into and out of the
+    # canonical frame and the index of the symmetry sending `state` to the
+    # canonical state, which tells the orientations of a position apart.
+    #
+    # engine    ->  Engine of the board
+    # state     ->  the packed board
+    def frame(self, engine, state):
+        frames = self.frames.get(engine)
+        if frames is None:
+            geometry = header_for(engine).hex()
+            symmetry = engine.symmetry
+            if symmetry is None:
+                identity = list(range(len(engine.moves)))
+                perms, inverses = [identity], [0]
+            else:
+                perms = symmetry.move_perms(engine.moves)
+                inverses = [symmetry.inverse(t) for t in range(len(symmetry))]
+            frames = self.frames[engine] = [geometry, perms, inverses]
+        geometry, perms, inverses = frames
+        if engine.symmetry is None:
+            canon, t = state, 0
+        else:
+            canon, t = engine.symmetry.canonical_with(state)
+        return [geometry, format(canon, "x"), perms[t], perms[inverses[t]], t]
+
+
+    # Forget every position.
+    def clear(self):
+        with self.lock:
+            with self.connection:
+                self.connection.execute("DELETE FROM positions")
+
+
+    def close(self):
+        self.connection.close()
+
+
+# ---------------------------------
+# STATIC FUNCTIONS BEYOND THIS POINT
+# ---------------------------------
+
+
+# Return the SolveCache at `path`, or None if there is none or it can not be
+# opened.
+#
+# path      ->  database file, PATH by default
+# create    ->  whether to create the database if it does not exist
+# capacity  ->  maximum number of positions kept
+def open_cache(path=None, create=False, capacity=CAPACITY):
+    if path is None:
+        path = PATH
+    if not create and not os.path.exists(path):
+        return None
+    try:
+        if create:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        connection = sqlite3.connect(path, timeout=TIMEOUT, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with connection:
+            connection.executescript(SCHEMA)
+            row = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None or row[0] != str(VERSION):
+                connection.execute("DROP TABLE positions")     # stale format
+                connection.executescript(SCHEMA)
+                connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(VERSION),))
+    except sqlite3.Error:
+        return None
+    return SolveCache(connection, path, capacity)
+
+
+# Return the SolveCache at PATH shared by every board of this process, or None
+# if there is none yet. A process started with fork() opens its own, since an
+# SQLite connection can not be used on both sides of a fork.
+def shared_cache():
+    if _shared[0] != os.getpid() or _shared[1] is None:
+        _shared[:] = [os.getpid(), open_cache()]
+    return _shared[1]
+
+
+# Fill `cache` in with the hint and solve of every starting position of a
+# board (one empty hole). Symmetric starting positions are only worked out
+# once. Returns False if there is no board of that size.
+#
+# size      ->  number of holes on the board
+# cache     ->  the SolveCache to fill in
+# report    ->  called with a progress message after each position, or None
+def warm(size, cache, report=None):
+    from board import pegboard
+
+    seen = set()
+    for n in range(size):
+        board = pegboard(size)
+        if board is None:
+            return False
+        board.cache = None      # work everything out rather than read it back
+        hole, engine = board.holes[n], board.engine
+        board.remove_peg(hole)
+        if engine.key(board.state) in seen:
+            continue
+        seen.add(engine.key(board.state))
+        start = time.perf_counter()
+        best_case = board.hint()[0]
+        counts = board.solve()
+        bests = TranspositionTable()
+        moves = [k for k in engine.legal_moves(board.state)
+                 if engine.best(board.state ^ engine.table[k][2], board.pegs_left - 1, bests) == best_case]
+        cache.store(engine, board.state, best_case, moves, counts, complete=True)
+        if report is not None:
+            report("{} empty: best case {} pegs, {} games in {:.2f}s".format(
+                hole.name, best_case, sum(counts.values()), time.perf_counter() - start))
+    return True
+
+
+# Store hints and solves of the 15-hole board in a new cache and look them up
+# again, in every orientation. Returns the problems found, as messages.
+def check():
+    from board import pegboard
+
+    board = pegboard(15)
+    engine = board.engine
+    board.remove_peg(board.holes[0])
+    start, problems = board.state, []
+    stuck = engine.full & ~(engine.full - 1)    # a single peg: no move left
+    images = [start] if engine.symmetry is None else \
+        [engine.symmetry.apply(t, start) for t in range(len(engine.symmetry))]
+    counts = engine.solve(start, board.pegs_left, TranspositionTable())
+    best = [k for k in engine.legal_moves(start)
+            if engine.best(start ^ engine.table[k][2], board.pegs_left - 1, TranspositionTable()) == 1]
+    with tempfile.TemporaryDirectory() as directory:
+        cache = open_cache(os.path.join(directory, "cache.sqlite"), create=True)
+        expect = lambda what, got, wanted: got == wanted or problems.append(
+            "{}: got {}, expected {}".format(what, got, wanted))
+        cache.store(engine, start, counts=counts)
+        for n, state in enumerate(images):
+            expect("counts only, orientation {}".format(n), cache.lookup(engine, state), [None, None, counts])
+        cache.store(engine, stuck, 1, [])
+        expect("hint without a move", cache.lookup(engine, stuck), [1, None, None])
+        cache.store(engine, stuck, counts={ 1: 1 })
+        expect("hint without a move, then counts", cache.lookup(engine, stuck), [1, None, { 1: 1 }])
+        cache.store(engine, start, 1, best[:1])
+        expect("first move", cache.lookup(engine, start), [1, best[0], counts])
+        cache.store(engine, start, 1, best, complete=True)
+        for n, state in enumerate(images):
+            moves = [k for k in engine.legal_moves(state) if engine.best(
+                state ^ engine.table[k][2], board.pegs_left - 1, TranspositionTable()) == 1]
+            expect("every move, orientation {}".format(n), cache.lookup(engine, state), [1, moves[0], counts])
+        cache.close()
+    return problems
+
+
+def main(args):
+    command, args = (args[0], args[1:]) if args else ("info", [])
+    if command == "warm":
+        cache = open_cache(create=True)
+        if cache is None:
+            print("Could not open {}".format(PATH))
+            return 1
+        for size in [int(arg) for arg in args] or [15, 21]:
+            print("Warming the cache for {} holes".format(size))
+            if not warm(size, cache, lambda message: print("  " + message, flush=True)):
+                return 1
+        print("{} positions in {}".format(len(cache), PATH))
+    elif command == "info":
+        cache = open_cache()
+        if cache is None:
+            print("No cache at {}. Run `python cache.py warm` to create it".format(PATH))
+            return 0
+        print("{} positions in {}".format(len(cache), PATH))
+    elif command == "check":
+        problems = check()
+        for problem in problems:
+            print(problem)
+        print("{} problems found".format(len(problems)) if problems else "ok")
+        return 1 if problems else 0
+    elif command == "clear":
+        cache = open_cache()
+        if cache is None:
+            return 0
+        cache.clear()
+        print("Cleared {}".format(PATH))
+    else:
+        print("Unknown command: {}".format(command))
+        return 1
+    cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
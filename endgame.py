@@ -0,0 +1,187 @@
+#
+# An endgame database: for every position reachable on a board of a given
+#   size, the smallest number of pegs that can be left and one move that
+#   leaves it. Built offline by retrograde analysis and written to a binary
+#   file, which Board.hint() memory-maps so that a hint is a single lookup.
+#
+# File layout (little-endian):
+#   header  ->  MAGIC, VERSION (u16), board size (u16), number of moves (u16),
+#                   the first 8 bytes of a SHA-256 digest of the move table
+#   records ->  2 bytes per possible packed state, in state order:
+#                   best case -> smallest number of pegs that can be left,
+#                                0 if the state is not in the database
+#                   move      -> index of the first move (in Engine.moves
+#                                order) that leaves the best case, NO_MOVE if
+#                                no move can be made
+#
+# Usage: python endgame.py [size ...]  (default 15)
+#
+
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b"PEGE"
+VERSION = 1
+HEADER = struct.Struct("<4sHHH8s")
+RECORD = 2
+NO_MOVE = 0xFF
+
+# Where tables are written to and looked up from
+TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables")
+
+# Largest board a table is built for by default. Tables take 2 ** (size + 1)
+# bytes, so 21 holes take 4 MB and 28 would take 512 MB.
+MAX_SIZE = 21
+
+class EndgameTable:
+
+
+    # Constructor: use open_table() rather than calling this directly.
+    #
+    # file  ->  the open table file
+    # data  ->  read-only memory map of the file. Pages are only read from
+    #               disk when a lookup touches them
+    def __init__(self, file, data):
+        self.file = file
+        self.data = data
+
+
+    # Return [best_case, move] for `state` as Engine.hint() would, or None if
+    # the state is not in the database.
+    #
+    # state ->  the packed board
+    def lookup(self, state):
+        offset = HEADER.size + RECORD * state
+        if offset + RECORD > len(self.data):
+            return None
+        best_case, move = self.data[offset], self.data[offset + 1]
+        if best_case == 0:
+            return None
+        return [best_case, None if move == NO_MOVE else move]
+
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+# ---------------------------------
+# STATIC FUNCTIONS BEYOND THIS POINT
+# ---------------------------------
+
+
+# Return the path of the table for boards of a given size.
+#
+# size  ->  number of holes on the board
+def path_for(size):
+    return os.path.join(TABLE_DIR, "endgame-{}.bin".format(size))
+
+
+# Return the header a table built for `engine` must start with. The move
+# digest guards against tables built for a different move order. hashlib is
+# slow to import, so it is only imported once a header is needed.
+#
+# engine    ->  Engine of the board
+def header_for(engine):
+    import hashlib
+
+    digest = hashlib.sha256(repr(engine.moves).encode()).digest()[:8]
+    return HEADER.pack(MAGIC, VERSION, engine.size, len(engine.moves), digest)
+
+
+# Return the EndgameTable for `engine`'s board, or None if no valid table has
+# been built for it.
+#
+# engine    ->  Engine of the board
+# path      ->  table file, path_for(engine.size) by default
+def open_table(engine, path=None):
+    if path is None:
+        path = path_for(engine.size)
+    try:
+        file = open(path, "rb")
+    except OSError:
+        return None
+    try:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        file.close()
+        return None
+    expected = HEADER.size + RECORD * (1 << engine.size)
+    if len(data) != expected or data[:HEADER.size] != header_for(engine):
+        data.close()
+        file.close()
+        return None
+    return EndgameTable(file, data)
+
+
+# Return the states reachable from every starting position of the board (one
+# empty hole), as an array of sets indexed by number of pegs.
+#
+# engine    ->  Engine of the board
+def reachable(engine):
+    layers = [set() for _ in range(engine.size + 1)]
+    layers[engine.size - 1] = { engine.full ^ (1 << k) for k in range(engine.size) }
+    for pegs in range(engine.size - 1, 1, -1):
+        below = layers[pegs - 1]
+        for state in layers[pegs]:
+            for k in engine.legal_moves(state):
+                below.add(state ^ engine.table[k][2])
+    return layers
+
+
+# Build the table for `engine`'s board and write it to `path`. Works backward
+# from the positions with the fewest pegs, so every move leads to a position
+# that has already been solved.
+#
+# engine    ->  Engine of the board
+# path      ->  table file, path_for(engine.size) by default
+# report    ->  called with a progress message after each layer, or None
+def build(engine, path=None, report=None):
+    if path is None:
+        path = path_for(engine.size)
+    if len(engine.moves) >= NO_MOVE:
+        raise ValueError("Too many moves for an endgame table: {}".format(len(engine.moves)))
+
+    records = bytearray(RECORD * (1 << engine.size))
+    layers = reachable(engine)
+    for pegs, layer in enumerate(layers):
+        for state in layer:
+            best_case, best_move = pegs, NO_MOVE
+            for k in engine.legal_moves(state):
+                result = records[RECORD * (state ^ engine.table[k][2])]
+                if best_move == NO_MOVE or result < best_case:
+                    best_case, best_move = result, k
+            records[RECORD * state] = best_case
+            records[RECORD * state + 1] = best_move
+        if layer and report is not None:
+            report("{} pegs: {} positions".format(pegs, len(layer)))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp = path + ".tmp"
+    with open(temp, "wb") as file:
+        file.write(header_for(engine))
+        file.write(records)
+    os.replace(temp, path)  # readers never see a half-written table
+
+
+def main(args):
+    from board import pegboard
+
+    sizes = [int(arg) for arg in args] or [15]
+    for size in sizes:
+        board = pegboard(size)
+        if board is None:
+            return 1
+        if size > MAX_SIZE:
+            print("Skipping size {}: tables are only built up to {} holes".format(size, MAX_SIZE))
+            continue
+        print("Building endgame table for {} holes".format(size))
+        build(board.engine, report=lambda message: print("  " + message))
+        print("Wrote {}".format(path_for(size)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,209 @@
+#
+# A bitboard search engine for a pegboard. The whole board is packed into a
+#   single int (bit k is set when hole k holds a peg) and every legal move is
+#   compiled ahead of time into a handful of bitmasks. Searching on ints means
+#   the hot loops of `hint` and `solve` never touch Hole or Turn objects.
+#
+
+from table import TranspositionTable
+
+class Engine:
+
+
+    # Constructor: compiled once per board from the adjacencies that
+    # `triangle()` has already given the holes.
+    #
+    # size  ->  number of holes on the board
+    # moves ->  array of (h, i, j) index triples, one per legal move, in the
+    #               same order that the board's holes and their adj_holes are
+    #               walked. Searches try moves in this order.
+    # table ->  array of (need, land, flip) bitmasks, one per move:
+    #               need -> holes h and i, which must both hold a peg
+    #               land -> hole j, which must be empty
+    #               flip -> xor-ed into a state to perform (or undo) the move
+    # by_h  ->  per hole, the (mask, need, flip) of every move out of it. A
+    #               move is legal when `state & mask == need`
+    # by_j  ->  per hole, the (mask, need, flip) of every move into it
+    # index ->  dictionary mapping an (h, i, j) index triple to its move
+    # touching  ->  per hole, the indices of every move that involves it as
+    #                   h, i or j. Only these moves can change legality when
+    #                   the hole gains or loses a peg
+    #
+    # symmetry  ->  Symmetry of the board, or None. Positions are stored in
+    #                   transposition tables under their canonical form, so
+    #                   rotations and reflections of a position share an entry
+    #
+    # Searches walk by_h from the pegs when there are few of them and by_j
+    # from the empty holes otherwise, so only moves that have a chance of
+    # being legal are ever tested.
+    def __init__(self, holes, symmetry=None):
+        self.size = len(holes)
+        self.symmetry = symmetry
+        self.full = (1 << self.size) - 1
+        self.moves = []
+        self.table = []
+        by_h = [[] for _ in holes]
+        by_j = [[] for _ in holes]
+        touching = [[] for _ in holes]
+        for h in holes:
+            for j, i in h.adj_holes.items():
+                for hole in (h, i, j):
+                    touching[hole.index].append(len(self.moves))
+                self.moves.append((h.index, i.index, j.index))
+                need = (1 << h.index) | (1 << i.index)
+                land = 1 << j.index
+                self.table.append((need, land, need | land))
+                by_h[h.index].append((need | land, need, need | land))
+                by_j[j.index].append((need | land, need, need | land))
+        self.by_h = tuple(map(tuple, by_h))
+        self.by_j = tuple(map(tuple, by_j))
+        self.touching = tuple(map(tuple, touching))
+        self.index = { move: k for k, move in enumerate(self.moves) }
+
+
+    # Return the key under which `state` is stored in a transposition table.
+    #
+    # state ->  the packed board
+    def key(self, state):
+        if self.symmetry is None:
+            return state
+        return self.symmetry.canonical(state)
+
+
+    # Return whether move k can be made from `state`.
+    #
+    # state ->  the packed board
+    # k     ->  index of the move
+    def is_legal(self, state, k):
+        need, land, _ = self.table[k]
+        return state & need == need and not state & land
+
+
+    # Return the indices of every move that can be made from `state`, in
+    # table order.
+    #
+    # state ->  the packed board
+    def legal_moves(self, state):
+        return [k for k, (need, land, _) in enumerate(self.table)
+                if state & need == need and not state & land]
+
+
+    # Return the smallest number of pegs that can be left on the board from
+    # `state` with `pegs` pegs on it. Stops early once a win is found.
+    #
+    # state ->  the packed board
+    # pegs  ->  number of pegs on the board (saves a popcount per node)
+    # table ->  TranspositionTable of best cases already worked out, or None
+    # stats ->  SearchStats to count into, or None
+    def best(self, state, pegs, table=None, stats=None):
+        if stats is not None:
+            stats.node(pegs)
+        if pegs == 1:
+            return 1
+        if table is not None:
+            key = self.key(state)
+            best_case = table.get(key)
+            if best_case is not None:
+                return best_case
+        best_case = pegs
+        if 2 * pegs > self.size:
+            bits, groups = self.full ^ state, self.by_j
+        else:
+            bits, groups = state, self.by_h
+        while bits and best_case > 1:
+            low = bits & -bits
+            bits ^= low
+            for mask, need, flip in groups[low.bit_length() - 1]:
+                if state & mask == need:
+                    if stats is not None:
+                        stats.hops += 1
+                    result = self.best(state ^ flip, pegs - 1, table, stats)
+                    if stats is not None:
+                        stats.rewinds += 1
+                    if result < best_case:
+                        best_case = result
+                        if best_case == 1:
+                            break
+        if stats is not None:
+            if best_case == pegs:
+                stats.leaves += 1
+            elif bits:
+                stats.pruned += 1   # stopped at a win
+        if table is not None:
+            table.put(key, best_case)
+        return best_case
+
+
+    # Return [best_case, move], where best_case is the smallest number of
+    # pegs that can be left on the board and move is the index of the first
+    # move (in table order) that still allows it. move is None when no move
+    # can be made.
+    #
+    # state ->  the packed board
+    # pegs  ->  number of pegs on the board
+    # stats ->  SearchStats to count into, or None
+    def hint(self, state, pegs, stats=None):
+        if stats is not None:
+            stats.node(pegs)
+        best_case, move = pegs, None
+        if pegs == 1:
+            return [best_case, move]
+        for k, (need, land, flip) in enumerate(self.table):
+            if state & need == need and not state & land:
+                if stats is not None:
+                    stats.hops += 1
+                result = self.best(state ^ flip, pegs - 1, None, stats)
+                if stats is not None:
+                    stats.rewinds += 1
+                if move is None or result < best_case:
+                    best_case, move = result, k
+                    if best_case == 1:
+                        break
+        return [best_case, move]
+
+
+    # Return a dictionary mapping a number of pegs left at the end of a game
+    # to the number of unique games from `state` that end that way.
+    #
+    # state ->  the packed board
+    # pegs  ->  number of pegs on the board
+    # table ->  TranspositionTable of histograms already worked out. Shared
+    #               between calls when given, private to this call otherwise
+    # stats ->  SearchStats to count into, or None
+    def solve(self, state, pegs, table=None, stats=None):
+        if table is None:
+            table = TranspositionTable()
+        return dict(self._solve(state, pegs, table, stats))
+
+
+    # Helper method for solve. Returns the histogram of `state`, which is
+    # shared with the table and must not be modified by the caller.
+    def _solve(self, state, pegs, table, stats):
+        if stats is not None:
+            stats.node(pegs)
+        key = self.key(state)
+        counts = table.get(key)
+        if counts is not None:
+            return counts
+        counts = dict()
+        if 2 * pegs > self.size:
+            bits, groups = self.full ^ state, self.by_j
+        else:
+            bits, groups = state, self.by_h
+        while bits:
+            low = bits & -bits
+            bits ^= low
+            for mask, need, flip in groups[low.bit_length() - 1]:
+                if state & mask == need:
+                    if stats is not None:
+                        stats.hops += 1
+                    for left, num in self._solve(state ^ flip, pegs - 1, table, stats).items():
+                        counts[left] = counts.get(left, 0) + num
+                    if stats is not None:
+                        stats.rewinds += 1
+        if not counts:
+            counts[pegs] = 1    # game over, this is a single game
+            if stats is not None:
+                stats.leaves += 1
+        table.put(key, counts)
+        return counts
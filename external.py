@@ -0,0 +1,314 @@
+#
+# An external-memory version of Engine.solve(), for boards whose layers do not
+#   fit in memory. Works breadth first, one peg-count layer at a time, like
+#   vectorized.py, but keeps every layer on disk:
+#
+#   expand  ->  the boards of a layer are read back through a memory map and
+#                   their children collected in memory, up to `run_size` of
+#                   them. Each full batch is sorted and written out as a run
+#                   file, so memory use never grows past one batch
+#   merge   ->  the run files are merged in state order into the file of the
+#                   next layer, adding up the path counts of boards found in
+#                   more than one run. No more than FAN_IN runs are open at
+#                   once: with more runs than that, groups of them are first
+#                   merged into longer runs, in as many passes as it takes
+#
+#   A manifest is written after every layer, so a solve that is interrupted
+#   carries on from the last finished layer when it is run again.
+#
+# File layout of layers and runs (little-endian), one record per board,
+#   sorted by state:
+#   state   ->  the canonical packed board (u64)
+#   paths   ->  number of move orders leading to it (u128, as two u64)
+#
+# Usage: python external.py size [--start hole] [--dir DIR] [--run-size N]
+#
+
+import argparse
+import heapq
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+
+from endgame import TABLE_DIR, header_for
+
+RECORD = struct.Struct("<QQQ")
+LOW = (1 << 64) - 1
+
+# Default number of boards collected in memory before a run is written out
+RUN_SIZE = 1 << 18
+
+# Largest number of run files merged at once, well below the usual limit of
+# 1024 open files (each run open for merging holds a file and a memory map)
+FAN_IN = 64
+
+MANIFEST = "manifest.json"
+
+# Names of the files a solve writes besides the manifest: layers, runs and
+# either of them half written
+WORK_FILE = re.compile(r"(layer-\d+|run-\d+-\d+)\.bin(\.tmp)?$")
+
+
+# Return the directory a solve from `state` keeps its files in by default.
+#
+# engine    ->  Engine of the board
+# state     ->  the packed board
+def directory_for(engine, state):
+    return os.path.join(TABLE_DIR, "external-{}-{:x}".format(engine.size, engine.key(state)))
+
+
+# Return the same histogram as Engine.solve(), keeping every layer on disk.
+# Picks up where an earlier, interrupted call with the same arguments left off.
+#
+# engine    ->  Engine of the board. Boards must fit in 64 bits
+# state     ->  the packed board
+# pegs      ->  number of pegs on the board
+# directory ->  where layers, runs and the manifest are kept,
+#                   directory_for(engine, state) by default. Only files a
+#                   solve writes are ever removed from it, and the directory
+#                   itself is removed once the solve is done, unless `keep`
+#                   is set, if it was created by this solve (or the one it
+#                   resumes)
+# run_size  ->  number of boards held in memory at once
+# report    ->  called with a progress message after each layer, or None
+# keep      ->  whether to leave the manifest behind when done, so that the
+#                   same solve is answered from it next time
+def solve(engine, state, pegs, directory=None, run_size=RUN_SIZE, report=None, keep=False):
+    if engine.size > 64:
+        raise ValueError("boards of {} holes do not fit in 64 bits".format(engine.size))
+    if directory is None:
+        directory = directory_for(engine, state)
+    created = not os.path.isdir(directory)
+    os.makedirs(directory, exist_ok=True)
+    root = engine.key(state)
+
+    manifest = _load(directory, engine, root)
+    if manifest is None:
+        manifest = {
+            "header": header_for(engine).hex(),
+            "root": root,
+            "pegs": pegs,
+            "counts": dict(),
+            "layers": [],
+            "created": created,
+        }
+        _write(_layer_path(directory, pegs), [(root, 1)])
+        _save(directory, manifest)
+    elif report is not None and manifest["pegs"] > 0:
+        report("Resuming at {} pegs".format(manifest["pegs"]))
+    _tidy(directory, manifest["pegs"])
+
+    while manifest["pegs"] > 0:
+        start = time.perf_counter()
+        pegs = manifest["pegs"]
+        layer = _layer_path(directory, pegs)
+        runs, stuck = _expand(engine, layer, directory, pegs, run_size)
+        positions = _merge(runs, _layer_path(directory, pegs - 1), directory, pegs - 1)
+
+        counts = manifest["counts"]
+        if stuck:
+            counts[str(pegs)] = counts.get(str(pegs), 0) + stuck
+        manifest["pegs"] = pegs - 1 if positions else 0
+        manifest["layers"].append({
+            "pegs": pegs - 1,
+            "positions": positions,
+            "runs": len(runs),
+            "seconds": round(time.perf_counter() - start, 3),
+        })
+        _save(directory, manifest)    # the layer is done once this is written
+        _tidy(directory, manifest["pegs"])
+        if report is not None and positions:
+            report("{} pegs: {} positions from {} runs in {:.2f}s".format(
+                pegs - 1, positions, len(runs), manifest["layers"][-1]["seconds"]))
+
+    counts = { int(left): num for left, num in manifest["counts"].items() }
+    if not keep:
+        os.remove(os.path.join(directory, MANIFEST))
+        if manifest.get("created"):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass    # something else was put in it since
+    return counts
+
+
+# Helper method for solve. Expands every board of the layer in `path` and
+# writes their children out as sorted run files. Returns [runs, stuck], the
+# paths of the runs and the number of games ending in this layer.
+def _expand(engine, path, directory, pegs, run_size):
+    runs, stuck, batch = [], 0, dict()
+    for state, paths in _read(path):
+        moves = engine.legal_moves(state)
+        if not moves:
+            stuck += paths
+        for k in moves:
+            child = engine.key(state ^ engine.table[k][2])
+            batch[child] = batch.get(child, 0) + paths
+        if len(batch) >= run_size:
+            runs.append(_flush(batch, directory, pegs - 1, len(runs)))
+    if batch:
+        runs.append(_flush(batch, directory, pegs - 1, len(runs)))
+    return [runs, stuck]
+
+
+# Helper method for _expand. Writes `batch` out as a sorted run file, empties
+# it and returns the path of the run.
+def _flush(batch, directory, pegs, n):
+    path = _run_path(directory, pegs, n)
+    _write(path, sorted(batch.items()))
+    batch.clear()
+    return path
+
+
+# Helper method for solve. Merges sorted run files into one sorted file at
+# `path`, adding up the paths of boards found in several runs, and removes
+# the runs. While there are more than `fan_in` runs, every group of `fan_in`
+# of them is merged into a new run of the layer first. Returns the number of
+# boards written.
+#
+# runs      ->  paths of the run files
+# path      ->  file to write
+# directory ->  where the runs are kept
+# pegs      ->  number of pegs on the boards of the runs
+# fan_in    ->  largest number of runs open at once
+def _merge(runs, path, directory, pegs, fan_in=FAN_IN):
+    n = len(runs)
+    while len(runs) > fan_in:
+        longer = []
+        for start in range(0, len(runs), fan_in):
+            group = runs[start:start + fan_in]
+            if len(group) == 1:
+                longer.extend(group)
+                continue
+            longer.append(_run_path(directory, pegs, n))
+            n += 1
+            _write(longer[-1], _combine(group))
+            for run in group:
+                os.remove(run)
+        runs = longer
+    count = _write(path, _combine(runs))
+    for run in runs:
+        os.remove(run)
+    return count
+
+
+# Helper method for _merge. Yields the (state, paths) records of sorted run
+# files in state order, adding up the paths of boards found in several runs.
+def _combine(runs):
+    last, total = None, 0
+    for state, paths in heapq.merge(*[_read(run) for run in runs]):
+        if state != last:
+            if last is not None:
+                yield (last, total)
+            last, total = state, 0
+        total += paths
+    if last is not None:
+        yield (last, total)
+
+
+# Helper method for solve. Writes (state, paths) records to `path`, through a
+# temporary file so that a half-written file is never mistaken for a finished
+# one. Returns the number of records written.
+def _write(path, records):
+    count, temp = 0, path + ".tmp"
+    with open(temp, "wb") as file:
+        for state, paths in records:
+            if paths >> 128:
+                raise OverflowError("path count does not fit in 128 bits: {}".format(paths))
+            file.write(RECORD.pack(state, paths & LOW, paths >> 64))
+            count += 1
+    os.replace(temp, path)
+    return count
+
+
+# Helper method for solve. Yields the (state, paths) records of the file at
+# `path`, read through a memory map.
+def _read(path):
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for offset in range(0, len(data), RECORD.size):
+                state, low, high = RECORD.unpack_from(data, offset)
+                yield (state, low | high << 64)
+
+
+# Helper method for solve. Removes every file a solve writes to `directory`
+# but the layer being worked on: runs and temporary files left by an
+# interrupted layer, and layers that are done with. Any other file is left
+# alone.
+def _tidy(directory, pegs):
+    keep = os.path.basename(_layer_path(directory, pegs)) if pegs else None
+    for name in os.listdir(directory):
+        if name != keep and WORK_FILE.match(name):
+            os.remove(os.path.join(directory, name))
+
+
+def _layer_path(directory, pegs):
+    return os.path.join(directory, "layer-{}.bin".format(pegs))
+
+
+def _run_path(directory, pegs, n):
+    return os.path.join(directory, "run-{}-{}.bin".format(pegs, n))
+
+
+# Helper method for solve. Returns the manifest in `directory` if it belongs
+# to a solve from `root` on `engine`'s board, and None otherwise.
+def _load(directory, engine, root):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("header") != header_for(engine).hex() or manifest.get("root") != root:
+        return None
+    pegs = manifest["pegs"]
+    if pegs > 0 and not os.path.exists(_layer_path(directory, pegs)):
+        return None
+    return manifest
+
+
+def _save(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".tmp", "w") as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def main(args):
+    from board import pegboard
+
+    parser = argparse.ArgumentParser(description="Solve a Peg Game board with its layers kept on disk")
+    parser.add_argument("size", type=int, help="number of holes on the board")
+    parser.add_argument("--start", default="a", help="name of the empty hole (default a)")
+    parser.add_argument("--dir", help="where to keep layer files (default under tables/)")
+    parser.add_argument("--run-size", type=int, default=RUN_SIZE,
+                        help="boards held in memory at once (default {})".format(RUN_SIZE))
+    parser.add_argument("--keep", action="store_true", help="keep the manifest once done")
+    options = parser.parse_args(args)
+
+    board = pegboard(options.size)
+    if board is None:
+        return 1
+    hole = board.hole(options.start)
+    if hole is None:
+        print("No hole named {}".format(options.start))
+        return 1
+    board.remove_peg(hole)
+    print("Solving {} holes with hole {} empty".format(options.size, options.start))
+    counts = solve(board.engine, board.state, board.pegs_left, options.dir, options.run_size,
+                   lambda message: print("  " + message, flush=True), options.keep)
+    total = sum(counts.values())
+    print("There are {} unique games. Of those games...".format(total))
+    for num_pegs in sorted(counts):
+        print("  {} end with {} pegs left ({}%)".format(
+            counts[num_pegs], num_pegs, round(counts[num_pegs] / total * 100, 2)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
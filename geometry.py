@@ -0,0 +1,325 @@
+#
+# The geometry of a pegboard: its holes with their names and adjacencies, and
+#   everything compiled from them (the Engine's move tables and symmetries,
+#   the Bounds of the hint search and the endgame table). None of it changes
+#   during a game, so it is built once per board size and shared by every
+#   Board of that size, which only keeps what a game changes: the packed
+#   state and the log of moves.
+#
+# Boards other than triangles are compiled from a layout: one string per row
+#   of the board, with an `o` for every hole. Holes are numbered and named in
+#   reading order, a peg can jump along the rows and columns of the layout,
+#   and the symmetries of the board are those of the square that keep every
+#   hole on a hole. Triangles keep the hole and move order they have always
+#   had, so that the endgame tables and caches built for them stay valid.
+#
+# Building a geometry takes far longer than starting a game otherwise does, so
+#   every geometry built is also pickled to TABLE_DIR and read back by the
+#   next process to ask for it. The cached file is rebuilt whenever any
+#   module it was compiled by has changed since it was written.
+#
+# Usage: python geometry.py [size ...]   (default 15 21 33 37)
+#
+
+import os
+import sys
+
+import bounds
+import endgame
+from engine import Engine
+from hole import Hole
+from symmetry import grid_symmetries, Symmetry, triangle_symmetries
+
+# Layouts of the boards compiled by cross(), by number of holes
+CROSSES = {
+    # English board, the classic 33-hole cross
+    33: ("  ooo  ",
+         "  ooo  ",
+         "ooooooo",
+         "ooooooo",
+         "ooooooo",
+         "  ooo  ",
+         "  ooo  "),
+    # European (French) board, the cross with its corners filled in
+    37: ("  ooo  ",
+         " ooooo ",
+         "ooooooo",
+         "ooooooo",
+         "ooooooo",
+         " ooooo ",
+         "  ooo  "),
+}
+
+# Format of the cached geometries. Cached files in any other format are built
+# again
+VERSION = 1
+
+# Sizes of the boards prebuilt by main()
+STANDARD = (15, 21, 33, 37)
+
+# Modules a geometry is compiled by. A change to any of them makes the cached
+# geometries stale
+SOURCES = ("bounds.py", "engine.py", "geometry.py", "hole.py", "symmetry.py")
+
+# Steps (rows, columns) a peg jumps along on a layout, in the order moves are
+# tried: right, down, left and up
+STEPS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+class Geometry:
+
+
+    # Constructor: relies on static functions like triangle() to feed it the
+    # correct inputs. Geometries are shared, so nothing here may be changed
+    # once built.
+    #
+    # holes     ->  tuple of the holes of the board, already given proper
+    #                   adjacencies, indexed by Hole.index
+    # size      ->  len(holes)
+    # rows      ->  the rows the board is printed on, as [indent, cells]:
+    #                   cells holds the index of the hole in each cell of the
+    #                   row, None for a gap, and the row is indented by
+    #                   `indent` half cells
+    # num_rows  ->  len(rows)
+    # names     ->  dictionary mapping the name of every hole to the hole
+    # engine    ->  Engine compiled from the adjacencies of `holes`
+    # bounds    ->  Bounds of the hint search, derived from `engine`
+    # endgame   ->  EndgameTable for boards of this size, or None if none has
+    #                   been built (see endgame.py). Opened on first use and
+    #                   only read. Never pickled
+    def __init__(self, holes, rows, symmetry=None):
+        self.holes = tuple(holes)
+        self.size = len(holes)
+        self.rows = rows
+        self.num_rows = len(rows)
+        self.names = { hole.name: hole for hole in holes }
+        self.engine = Engine(holes, symmetry)
+        self.bounds = bounds.Bounds(self.engine)
+        self._opened = False
+        self._endgame = None
+
+
+    @property
+    def endgame(self):
+        if not self._opened:
+            self._endgame = endgame.open_table(self.engine)
+            self._opened = True
+        return self._endgame
+
+
+    # The endgame table is memory-mapped, so it is left out of the pickle and
+    # opened again by the process that reads it.
+    def __getstate__(self):
+        return dict(self.__dict__, _opened=False, _endgame=None)
+
+
+    # Return the values of `arr`, one per hole, laid out in the shape of the
+    # board. Every value takes as many columns as the longest of them.
+    #
+    # arr   ->  Array of values to print, indexed by Hole.index
+    def show(self, arr):
+        width = max(len(str(value)) for value in arr) + 1
+        lines = []
+        for indent, cells in self.rows:
+            line = " " * (indent * width // 2)
+            for k in cells:
+                line += " " * width if k is None else "{} ".format(arr[k]).ljust(width)
+            lines.append(line)
+        return "\n".join(lines)
+
+
+# Dictionary mapping a board size to its Geometry, for every size built so far
+_geometries = dict()
+
+
+# ---------------------------------
+# STATIC FUNCTIONS BEYOND THIS POINT
+# ---------------------------------
+
+
+# Return the name of hole `index`: a to z, then aa, ab and so on, so that every
+# hole of any board has a name of its own.
+#
+# index ->  the index of the hole
+def hole_name(index):
+    name = ""
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        name = chr(97 + rest) + name
+    return name
+
+
+# Return the Geometry of the board of a given size: the cross of that many
+# holes if there is one (see CROSSES), the triangle otherwise. Returns None if
+# there is no such board.
+#
+# size  ->  number of holes
+def for_size(size):
+    return cross(size) if size in CROSSES else triangle(size)
+
+
+# Return the Geometry of the cross-shaped board of a given size (see
+# CROSSES), building it on first use. Returns None if there is none.
+#
+# size  ->  number of holes
+def cross(size):
+    if size not in CROSSES:
+        return None
+    geometry = _geometries.get(size)
+    if geometry is None:
+        geometry = _geometries[size] = load(size) or save(compile(CROSSES[size]))
+    return geometry
+
+
+# Return the Geometry of a board drawn as a layout: one string per row, with
+# an `o` for every hole and any other character for a gap. Pegs jump along
+# rows and columns.
+#
+# layout    ->  array of the rows of the board
+def compile(layout):
+    coords = [(r, c) for r, row in enumerate(layout) for c, cell in enumerate(row) if cell == "o"]
+    index = { coord: k for k, coord in enumerate(coords) }
+    holes = [Hole(hole_name(k), k) for k in range(len(coords))]
+    for (r, c), h in zip(coords, holes):
+        for dr, dc in STEPS:
+            i, j = index.get((r + dr, c + dc)), index.get((r + 2 * dr, c + 2 * dc))
+            if i is not None and j is not None:
+                h.adj_holes[holes[j]] = holes[i]
+    width = max(c for _, c in coords) + 1
+    rows = [[0, [index.get((r, c)) for c in range(width)]] for r in range(len(layout))]
+    return Geometry(holes, rows, Symmetry(grid_symmetries(coords)))
+
+
+# Return the Geometry of the triangular pegboard of a given size, building it
+# on first use. Returns None if `size` holes do not form a triangle, or it
+# is too small or too large to play on.
+#
+# size  ->  number of holes
+def triangle(size):
+    if size in CROSSES:
+        return None     # not a triangle, and its cache holds the cross
+    geometry = _geometries.get(size) or load(size)
+    if geometry is not None:
+        _geometries[size] = geometry
+        return geometry
+
+    # Initialize set N(n) = N(n - 1) + n, with  N(0) = 0 and N(n) < `size`
+    # (Example: [0, 1, 3, 6, 10] with `size` = 15)
+    # In other words, calculate valid sizes for trianglular board, and the
+    # indexes at which a new row begins
+    nums = []
+    num, i = 0, 0
+    while num < size:
+        nums.append(num)
+        num += i + 1
+        i += 1
+
+    # check that size given forms a perfect triangular board
+    if num > size or size < 10 or size > 160:
+        return None
+
+    # array of holes, names in ascending order from ASCII lowercase a
+    holes = []
+    for i in range(size):
+        holes.append(Hole(hole_name(i), i))
+
+    # handle adjacencies - each iteration does this for one row
+    # will only add valid moves to avoid unnecessary checks
+    for new_left, old_left in zip(nums[1:], nums):
+        right = 2 * new_left - old_left
+        row_size = 1 + new_left - old_left
+        if new_left > 1:
+            # leftmost hole in a given row
+            holes[new_left].add_hole(holes[old_left], holes[new_left - 2 * row_size + 3])
+            # rightmost holes in a given row
+            holes[right].add_hole(holes[new_left - 1], holes[old_left - 1])
+            holes[right].add_hole(holes[right - 1], holes[right - 2])
+        # holes in the center
+        # k = index of current hole
+        for k in range(new_left + 1, right):
+            # size of the new row
+            if new_left > 3:
+                if k > new_left + 1:
+                    holes[k].add_hole(holes[k - row_size], holes[k - 2 * row_size + 1])
+                    holes[k].add_hole(holes[k - 1], holes[k - 2])
+                if k < right - 1:
+                    holes[k].add_hole(holes[k - row_size + 1], holes[k - 2 * row_size + 3])
+    rows = [[len(nums) - r, list(range(left, left + r + 1))] for r, left in enumerate(nums)]
+    geometry = Geometry(holes, rows, Symmetry(triangle_symmetries(len(nums))))
+    _geometries[size] = save(geometry)
+    return geometry
+
+
+# Return the path the geometry of boards of `size` holes is cached at.
+def path_for(size):
+    return os.path.join(endgame.TABLE_DIR, "geometry-{}.pickle".format(size))
+
+
+# Return the modification time and length of every module in SOURCES, which
+# a cached geometry must have been written with.
+def fingerprint():
+    result, here = [], os.path.dirname(os.path.abspath(__file__))
+    for name in SOURCES:
+        info = os.stat(os.path.join(here, name))
+        result.append((info.st_mtime_ns, info.st_size))
+    return result
+
+
+# Return the cached Geometry of boards of `size` holes, or None if none has
+# been cached or it is stale. Cached files are trusted just as the modules
+# beside them are. pickle is only imported here and in save(), once a board is
+# asked for, so that it does not slow down the start of the game.
+#
+# size  ->  number of holes
+def load(size):
+    import pickle
+
+    try:
+        with open(path_for(size), "rb") as file:
+            version, sources, geometry = pickle.load(file)
+    except Exception:
+        return None     # missing, unreadable or written by older code
+    if version != VERSION or sources != fingerprint() or geometry.size != size:
+        return None
+    return geometry
+
+
+# Cache `geometry` on disk for later processes and return it. Does nothing if
+# TABLE_DIR can not be written to.
+#
+# geometry  ->  the Geometry to cache
+def save(geometry):
+    import pickle
+
+    path = path_for(geometry.size)
+    temp = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp, "wb") as file:
+            pickle.dump([VERSION, fingerprint(), geometry], file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, path)  # readers never see a half-written file
+    except OSError:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+    return geometry
+
+
+def main(args):
+    import geometry     # pickle the classes of this module, not of __main__
+
+    for size in [int(arg) for arg in args] or STANDARD:
+        try:
+            os.remove(geometry.path_for(size))
+        except OSError:
+            pass
+        if geometry.for_size(size) is None:
+            print("There is no board of {} holes".format(size))
+            return 1
+        print("Cached the geometry of {} holes at {}".format(size, geometry.path_for(size)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,25 +1,30 @@
 #
-# Encapsulation of a hole on a pegboard.
+# Encapsulation of a hole on a pegboard. Holes are part of the geometry of a
+#   board, shared by every board of the same size (see geometry.py), so they
+#   do not know whether they hold a peg: Board.has_peg() does.
 #
 class Hole:
 
+    __slots__ = ("name", "index", "adj_holes")
+
 
     # Meant to be called by `triangle()` or any other function that returns a 
     # pegboard. 
     #
-    # name      ->      the hole name. Meant to be a single char from `a` 
-    #                       onwards. More info on this can be found in the 
-    #                       documentation for board.py
-    # has_peg   ->  whether the whole is currently occupied by a peg
+    # name      ->      the hole name: a to z, then aa, ab and so on, as
+    #                       given by geometry.hole_name()
+    # index     ->  position of the hole in the board's array of holes. Also
+    #                   the bit that stands for this hole in the packed
+    #                   states used by engine.py
     # adj_holes ->  dictionary of every legal move possible from this hole
-    def __init__(self, name):
+    def __init__(self, name, index):
         self.name = name
-        self.has_peg = True
+        self.index = index
         self.adj_holes = dict()
 
 
     def __str__(self):
-        result = "Hole {}. Has peg = {}\nAdjacent holes:\n".format(self.name, self.has_peg)
+        result = "Hole {}.\nAdjacent holes:\n".format(self.name)
         
         if self.adj_holes:
             for j, i in self.adj_holes.items():
@@ -2,15 +2,35 @@
 #   A series of static methods used by main()
 #
 
-from turn import Turn
+import os
+import select
+import sys
+import threading
 import time
 
+from turn import Turn
+
+# Number of seconds a `hint` may search for before giving its best move so far
+HINT_BUDGET = 5.0
+
+# Number of seconds `estimate` plays random games for
+ESTIMATE_BUDGET = 2.0
+
+# Number of seconds a search runs before its progress is shown, and between
+# two updates of it
+PROGRESS_DELAY = 0.5
+PROGRESS_EVERY = 0.1
+
 # Show the user all commands.
 def help():
     print("Actions:")
     print("  `x y`   -> move peg x to hole y")
     print("  `hint`  -> receive a hint")
     print("  `solve` -> show statistics for every possible outcome of this game")
+    print("  `estimate` -> estimate the same statistics from random games, for large boards")
+    print("  `analyze` -> show the best case and outcomes of every move you can make")
+    print("  `stats` -> show what the last `hint` or `solve` searched")
+    print("  `ponder`-> turn searching ahead while you think on or off")
     print("  `names` -> show the names of the holes")
     print("  `help`  -> show this screen")
     print("  `quit`  -> end Peg Game")
@@ -23,6 +43,8 @@ def help():
 def ask_for_move(board, hints):
 
     hints_left = hints  # decremented when the player uses a hint
+    board.instrument = True     # so that `stats` has something to show
+    ponderer = None             # searches in the background while input() waits
 
     help()
     print("Press `Enter` to start your game:")
@@ -37,7 +59,11 @@ def ask_for_move(board, hints):
         else:
             print("You have {} hints left".format(hints_left))
         print("Which peg would you like to move where?")
+        if ponderer is not None:
+            ponderer.start()
         args = input_handler(board, "move")
+        if ponderer is not None:
+            ponderer.stop()     # never search alongside the player's command
 
         src = args[0]
         match src:
@@ -45,8 +71,13 @@ def ask_for_move(board, hints):
                 help()
             case "hint":
                 if hints_left > 0:
-                    hint = board.hint(board.pegs_left, None, None)
-                    if hint[0] > 2:  # won't win, but print best-case scenario
+                    hint, cancelled = in_background(board, lambda: board.hint(board.pegs_left, None, None, budget=HINT_BUDGET), HINT_BUDGET)
+                    if cancelled:
+                        print("Search cancelled. Best found so far: {} pegs on the board".format(hint[0]))
+                    elif not hint[3]:  # ran out of time, best move found so far
+                        if hint[0] > 1:
+                            print("No win found in time. Best found so far: {} pegs on the board".format(hint[0]))
+                    elif hint[0] > 2:  # won't win, but print best-case scenario
                         print("Winning is impossible at this point. Best case scenario: {} pegs on the board".format(hint[0]))
                     print("You should move the peg on hole {} to hole {}".format(hint[1].name, hint[2].name))
                     hints_left -= 1 # decrement the number of hints the user has left
@@ -54,29 +85,52 @@ def ask_for_move(board, hints):
                     print("You don't have any hints left! Good luck the rest of the way")
             case "names":
                 print(board.show_names())
+            case "stats":
+                if board.last_stats is None:
+                    print("No search has been run yet. Type `hint` or `solve` first")
+                else:
+                    print(board.last_stats)
+            case "ponder":
+                if ponderer is None:
+                    from ponder import Ponderer     # loads a search engine
+                    ponderer = Ponderer(board)
+                    print("Pondering is on: the board will be searched while you think")
+                else:
+                    ponderer = None
+                    print("Pondering is off")
             case "quit":
                 return -1   # exit early and let main() know that the user wants the application to stop running
             case "solve":
-                logs_set = board.solve()
-                total = 0
-                keys = list(logs_set.keys())
-                keys.sort()
-                logs_set = { key: logs_set[key] for key in keys }
-                for logs in logs_set.values():
-                    total += len(logs)
-                print("There are {} unique games from this point. Of those games...".format(total))
-                for pegs_left, logs in logs_set.items():
-                    num_pegs, num_logs = pegs_left, len(logs)
-                    out1, out2 = "", ""
-                    if num_logs == 1:
-                        out1 = "1 game results"
-                    else:
-                        out1 = "{} games result".format(num_logs)
-                    if num_pegs == 1:
-                        out2 = "1 peg"
-                    else:
-                        out2 = "{} pegs".format(num_pegs)
-                    print("{} in {} being left on the board. That's a {}% chance.".format(out1, out2, round((num_logs / total) * 100, 2)))
+                counts, cancelled = in_background(board, board.solve)
+                total = sum(counts.values())
+                if cancelled:
+                    if total == 0:
+                        print("Search cancelled before any game was finished")
+                        continue
+                    print("Search cancelled about {}% of the way through. {} games found so far. Of those games...".format(
+                        round(board.last_stats.done * 100, 2), total))
+                else:
+                    print("There are {} unique games from this point. Of those games...".format(total))
+                show_counts(counts)
+            case "analyze":
+                moves, cancelled = in_background(board, board.analyze)
+                for l, m, best_case, counts in moves:
+                    total = sum(counts.values())
+                    outcomes = ", ".join("{} {}%".format("1 peg" if num_pegs == 1 else "{} pegs".format(num_pegs),
+                                                         round((counts[num_pegs] / total) * 100, 2))
+                                         for num_pegs in sorted(counts))
+                    print("Move {} to {}: best case {} left. {} games: {}".format(
+                        l.name, m.name, "1 peg" if best_case == 1 else "{} pegs".format(best_case), total, outcomes))
+                if cancelled:
+                    print("Analysis cancelled after {} of the moves".format(len(moves)))
+            case "estimate":
+                (counts, margins, games), cancelled = in_background(board, lambda: board.estimate(budget=ESTIMATE_BUDGET), ESTIMATE_BUDGET)
+                if games == 0:
+                    print("Estimate cancelled before any game was played")
+                    continue
+                print("There are about {} unique games from this point ({} random games played). Of those games...".format(
+                    sum(counts.values()), games))
+                show_counts(counts, margins)
             case _: # user entered invalid input or wants to move a peg
                 dest = args[1]
                 if (perform_move(board, src, dest)):
@@ -87,6 +141,101 @@ def ask_for_move(board, hints):
     return hints - hints_left
 
 
+# Print how many games end with each number of pegs, as `solve` and
+# `estimate` show them.
+#
+# counts    ->  dictionary mapping a number of pegs left to a number of games
+# margins   ->  dictionary mapping a number of pegs left to the half-width of
+#                   the 95% confidence interval of its share of the games, for
+#                   estimated counts. None for exact counts
+def show_counts(counts, margins=None):
+    total = sum(counts.values())
+    for num_pegs in sorted(counts):
+        num_games = counts[num_pegs]
+        out1, out2 = "", ""
+        if num_games == 1:
+            out1 = "1 game results"
+        else:
+            out1 = "{} games result".format(num_games)
+        if num_pegs == 1:
+            out2 = "1 peg"
+        else:
+            out2 = "{} pegs".format(num_pegs)
+        if margins is None:
+            print("{} in {} being left on the board. That's a {}% chance.".format(out1, out2, round((num_games / total) * 100, 2)))
+        else:
+            print("About {} in {} being left on the board. That's a {}% chance (± {}%).".format(
+                out1, out2, round((num_games / total) * 100, 2), round(margins[num_pegs] * 100, 2)))
+
+
+# Run search() in a worker thread and wait for it, showing its progress once
+# it takes a while. The player can cancel it with Ctrl-C, or by typing
+# `cancel` when playing in a terminal. Returns [result, cancelled], where
+# result is what search() returned, cut short if cancelled.
+#
+# board     ->  the pegboard searched
+# search    ->  function running board.hint() or board.solve()
+# budget    ->  number of seconds the search is limited to, or None. Used to
+#                   estimate its progress
+def in_background(board, search, budget=None):
+    cancel = threading.Event()
+    board.cancel = cancel
+    result, errors = [], []
+    def run():
+        try:
+            result.append(search())
+        except Exception as error:
+            errors.append(error)    # raised again below, on this thread
+    worker = threading.Thread(target=run, name="search", daemon=True)
+    start = time.monotonic()
+    worker.start()
+    shown = False
+    try:
+        while worker.is_alive():
+            if wait_for_cancel(worker, PROGRESS_EVERY):
+                cancel.set()
+            elif not cancel.is_set() and time.monotonic() - start > PROGRESS_DELAY:
+                shown = show_progress(board, start, budget) or shown
+    except KeyboardInterrupt:
+        cancel.set()
+    worker.join()
+    board.cancel = None
+    if shown:
+        print("\r\033[K", end="", flush=True)   # clear the progress line
+    if errors:
+        raise errors[0]
+    return [result[0], cancel.is_set()]
+
+
+# Helper method for in_background. Waits up to `timeout` seconds for the
+# worker to finish, and returns whether the player typed `cancel` meanwhile.
+# Input is only read while waiting in a terminal, so that scripted input meant
+# for later prompts is left alone.
+def wait_for_cancel(worker, timeout):
+    if os.name == "posix" and sys.stdin.isatty():
+        if select.select([sys.stdin], [], [], timeout)[0]:
+            if sys.stdin.readline().strip() == "cancel":
+                return True
+            print("Still searching. Type `cancel` or press Ctrl-C to stop")
+        return False
+    worker.join(timeout)
+    return False
+
+
+# Helper method for in_background. Shows the progress of the search running
+# on `board` on a single line. Returns whether anything was shown.
+def show_progress(board, start, budget):
+    stats = board.searching
+    if stats is None or not sys.stdout.isatty():
+        return False
+    done = stats.done
+    if budget is not None:
+        done = max(done, (time.monotonic() - start) / budget)
+    print("\r\033[KSearching: {} positions, about {}% done (`cancel` or Ctrl-C to stop)".format(
+        stats.nodes, round(min(done, 1.0) * 100)), end="", flush=True)
+    return True
+
+
 # Return whether move was successful.
 #
 # board ->  the pegboard
@@ -120,15 +269,15 @@ def input_handler(board, mode):
                             args[0] == "help"   or 
                             args[0] == "quit"   or 
                             args[0] == "names"  or
-                            args[0] == "solve"
+                            args[0] == "solve"  or
+                            args[0] == "stats"  or
+                            args[0] == "ponder" or
+                            args[0] == "estimate" or
+                            args[0] == "analyze"
                         ):
                             return args
                     else:
-                        if (
-                            len(args) == 2 and 
-                            len(args[0]) == 1 and 
-                            len(args[1]) == 1
-                        ):
+                        if len(args) == 2:     # hole names are checked by the move
                             return args
                     print("Invalid move!")
                     print(board)
@@ -148,24 +297,25 @@ def input_handler(board, mode):
                         int(args[0]) > -1
                     ):
                         return args
-                # size of the board (either 15 or 21)
+                # size of the board (15 or 21 for a triangle, 33 or 37 for a cross)
                 case "board_size":
                     if (
                         len(args) == 1 and 
                         args[0].isdigit() and
                         (
                         int(args[0]) == 15 or
-                        int(args[0]) == 21
+                        int(args[0]) == 21 or
+                        int(args[0]) == 33 or
+                        int(args[0]) == 37
                         )
                     ):
                         return args
                     else:
-                        print("Invalid pegboard size: pegboard should be either 15 (normal) or 21 (large)")
+                        print("Invalid pegboard size: pegboard should be 15 (normal), 21 (large), 33 (English cross) or 37 (European cross)")
                 # which hole should be empty at the start of the game
                 case "starting_hole":
-                    if len(args) == 1 and len(args[0]) == 1:
-                        if board.hole(args[0]) is not None:
-                            return args
+                    if len(args) == 1 and board.hole(args[0]) is not None:
+                        return args
                     else:
                         print("Invalid input. Hole names should be among those shown above")
 
@@ -0,0 +1,135 @@
+#
+# Load generator for server.py. Opens many connections, each playing random
+#   games one after another: every turn it makes a random legal move, and
+#   asks for a hint or a solve first now and then. Reports the requests per
+#   second the server answered and the latency of each kind of request.
+#
+# Usage: python loadgen.py [--socket PATH | --port N] [--clients N]
+#            [--duration SECONDS] [--size N] [--hints P] [--solves P]
+#
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import geometry
+from server import LIMIT, SOCKET
+
+# Percentiles reported for every kind of request
+PERCENTILES = (50, 90, 99, 99.9)
+
+class Client:
+
+
+    # reader, writer    ->  the connection to the server
+    # latencies         ->  dictionary mapping an op to the seconds each
+    #                           request of it took
+    # errors            ->  number of requests answered with an error
+    def __init__(self, reader, writer, latencies):
+        self.reader = reader
+        self.writer = writer
+        self.latencies = latencies
+        self.errors = 0
+
+
+    # Send one request and return its response.
+    async def request(self, op, **fields):
+        start = time.perf_counter()
+        self.writer.write(json.dumps(dict(fields, op=op)).encode() + b"\n")
+        await self.writer.drain()
+        response = json.loads(await self.reader.readline())
+        self.latencies.setdefault(op, []).append(time.perf_counter() - start)
+        if not response["ok"]:
+            self.errors += 1
+        return response
+
+
+    # Play random games until `deadline` (a time.monotonic() value).
+    async def play(self, deadline, size, hints, solves, rng):
+        while time.monotonic() < deadline:
+            state = await self.request("create", size=size, start=rng.choice(names(size)))
+            if not state["ok"]:
+                return
+            session = state["session"]
+            while state["moves"] and time.monotonic() < deadline:
+                if rng.random() < solves:
+                    await self.request("solve", session=session)
+                elif rng.random() < hints:
+                    await self.request("hint", session=session)
+                src, dest = rng.choice(state["moves"]).split("-")
+                state = await self.request("move", session=session, src=src, dest=dest)
+            await self.request("close", session=session)
+
+
+# Return the names of the holes of a board of `size` holes.
+def names(size):
+    return list(geometry.for_size(size).names)
+
+
+# Return the value below which `percent` percent of the sorted `values` fall.
+def percentile(values, percent):
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+async def run(options):
+    async def connect():
+        if options.port is not None:
+            return await asyncio.open_connection("127.0.0.1", options.port, limit=LIMIT)
+        return await asyncio.open_unix_connection(options.socket, limit=LIMIT)
+
+    latencies, rng = dict(), random.Random(options.seed)
+    clients = [Client(*await connect(), latencies) for _ in range(options.clients)]
+    start = time.monotonic()
+    deadline = start + options.duration
+    await asyncio.gather(*[client.play(deadline, options.size, options.hints, options.solves,
+                                       random.Random(rng.random())) for client in clients])
+    elapsed = time.monotonic() - start
+    stats = await clients[0].request("stats")
+    for client in clients:
+        client.writer.close()
+
+    total = sum(len(values) for values in latencies.values())
+    print("{} requests from {} clients in {:.2f}s: {:.0f} requests/s, {} errors".format(
+        total, len(clients), elapsed, total / elapsed, sum(client.errors for client in clients)))
+    print("{:>8} {:>8}".format("op", "count") + "".join(
+        "{:>10}".format("p{:g}".format(percent)) for percent in PERCENTILES) + "{:>10}".format("max"))
+    everything = []
+    for op in sorted(latencies):
+        values = sorted(latencies[op])
+        everything += values
+        print(row(op, values))
+    print(row("all", sorted(everything)))
+    print("Server: {} sessions, {} searches, {} reused".format(
+        stats["sessions"], stats["searches"], stats["reused"]))
+
+
+# Helper method for run. Formats one line of the latency table, in milliseconds.
+def row(op, values):
+    return "{:>8} {:>8}".format(op, len(values)) + "".join(
+        "{:>10.2f}".format(percentile(values, percent) * 1000) for percent in PERCENTILES + (100,))
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Measure the throughput and latency of server.py")
+    parser.add_argument("--socket", default=SOCKET, help="Unix socket of the server (default {})".format(SOCKET))
+    parser.add_argument("--port", type=int, help="connect to this TCP port of 127.0.0.1 instead")
+    parser.add_argument("--clients", type=int, default=100, help="connections, each playing one game at a time (default 100)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run for (default 10)")
+    parser.add_argument("--size", type=int, default=15, help="board size (default 15)")
+    parser.add_argument("--hints", type=float, default=0.2, help="chance of asking for a hint each turn (default 0.2)")
+    parser.add_argument("--solves", type=float, default=0.02, help="chance of asking for a solve each turn (default 0.02)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random games (default 0)")
+    options = parser.parse_args(args)
+    try:
+        asyncio.run(run(options))
+    except OSError as error:
+        print("Could not reach the server: {}".format(error))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,184 @@
+#
+# An approximate version of Engine.solve() for boards too large to solve
+#   exactly. Plays random games from the board and estimates how many games
+#   end with each number of pegs using Knuth's estimator: a game that had
+#   b1, b2, ... legal moves to choose from at each turn stands for
+#   b1 * b2 * ... games, since it was picked with that small a chance. The
+#   average of those weights over many random games is an unbiased estimate
+#   of the number of games, and it is split up by how many pegs they end with.
+#
+#   Games are played in batches, on NumPy arrays when NumPy is installed (one
+#   row per game, every move tested on every game at once) and one at a time
+#   otherwise. Batches can be spread over several processes. Each batch only
+#   returns a few sums, from which the estimates and their 95% confidence
+#   intervals are worked out.
+#
+
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from stats import Cancelled
+import vectorized
+
+# Number of games played per batch
+BATCH = 4096
+
+# Default number of seconds to play for, when no number of games is given
+BUDGET = 2.0
+
+# Normal quantile of a two-sided 95% confidence interval
+Z = 1.96
+
+# Worker process state, set up once per process by _start()
+_engine = None
+
+
+def _start(engine):
+    global _engine
+    _engine = engine
+
+
+# A task is (state, pegs, size, seed). Returns the sums of _batch().
+def _play(task):
+    return _batch(_engine, *task)
+
+
+# Return [counts, margins, games]. counts maps a number of pegs left at the
+# end of the game to the estimated number of unique games from `state` that
+# end that way, as Engine.solve() would count them. margins maps it to the
+# half-width of the 95% confidence interval of that share of the games (as a
+# fraction). games is the number of random games played.
+#
+# engine    ->  Engine of the board
+# state     ->  the packed board
+# pegs      ->  number of pegs on the board
+# games     ->  number of random games to play, None to play for `budget`
+#                   seconds instead
+# budget    ->  number of seconds to play for when `games` is None
+# seed      ->  seed of the random games. The same seed and number of games
+#                   give the same estimate
+# workers   ->  number of processes to play with, None for one per CPU
+# stats     ->  SearchStats to count into, or None. Every game counts as a
+#                   leaf and stats.done follows the games played. Checked for
+#                   cancellation between batches, and a cancelled estimate is
+#                   made from the batches already played
+def estimate(engine, state, pegs, games=None, budget=BUDGET, seed=None, workers=1,
+             stats=None):
+    if seed is None:
+        seed = random.randrange(1 << 32)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    start = time.monotonic()
+    played, n = [0, dict(), dict(), 0.0], 0
+
+    def more():
+        if games is not None:
+            return played[0] < games
+        return time.monotonic() - start < budget
+
+    def add(sums):
+        played[0] += sums[0]
+        for left in sums[1]:
+            played[1][left] = played[1].get(left, 0.0) + sums[1][left]
+            played[2][left] = played[2].get(left, 0.0) + sums[2][left]
+        played[3] += sums[3]
+        if stats is not None:
+            stats.nodes += sums[0]
+            stats.leaves += sums[0]
+            stats.done = played[0] / games if games is not None else (time.monotonic() - start) / budget
+
+    def size(n):
+        return BATCH if games is None else max(0, min(BATCH, games - played[0] - n * BATCH))
+
+    try:
+        if workers == 1:
+            while more():
+                if stats is not None:
+                    stats.check()
+                add(_batch(engine, state, pegs, size(0), [seed, n]))
+                n += 1
+        else:
+            with ProcessPoolExecutor(workers, initializer=_start, initargs=(engine,)) as pool:
+                while more():
+                    if stats is not None:
+                        stats.check()
+                    tasks = [(state, pegs, size(i), [seed, n + i]) for i in range(workers)]
+                    for sums in pool.map(_play, [task for task in tasks if task[2]]):
+                        add(sums)
+                    n += workers
+    except Cancelled:
+        pass
+
+    total_games, weights, squares, all_squares = played
+    counts, margins = dict(), dict()
+    total = sum(weights.values())
+    for left in sorted(weights):
+        counts[left] = round(weights[left] / total_games)
+        share = weights[left] / total
+        variance = max(0.0, (1 - 2 * share) * squares[left] + share * share * all_squares)
+        margins[left] = Z * variance ** 0.5 / total
+    return [counts, margins, total_games]
+
+
+# Helper method for estimate. Plays `size` random games from `state` and
+# returns [games, weights, squares, all_squares]: weights and squares map a
+# number of pegs left to the sum of the weights and of the squared weights of
+# the games ending with it, and all_squares is the sum of every squared
+# weight. The sums are all an estimate needs and add up across batches.
+#
+# seed  ->  [seed, batch number] of the random games. Games are played on
+#               NumPy arrays when NumPy is installed and boards fit in
+#               vectorized.BITS bits
+def _batch(engine, state, pegs, size, seed):
+    if engine.size <= vectorized.BITS and vectorized.available():
+        return _batch_arrays(engine, state, pegs, size, seed)
+    rng = random.Random(seed[0] * 1000003 + seed[1])
+    weights, squares, all_squares = dict(), dict(), 0.0
+    for _ in range(size):
+        game, left, weight = state, pegs, 1.0
+        moves = engine.legal_moves(game)
+        while moves:
+            weight *= len(moves)
+            game ^= engine.table[rng.choice(moves)][2]
+            left -= 1
+            moves = engine.legal_moves(game)
+        weights[left] = weights.get(left, 0.0) + weight
+        squares[left] = squares.get(left, 0.0) + weight * weight
+        all_squares += weight * weight
+    return [size, weights, squares, all_squares]
+
+
+# Helper method for _batch. Plays the games on NumPy arrays, one row per
+# game, every move tested on every game still going at once.
+def _batch_arrays(engine, state, pegs, size, seed):
+    np = vectorized._numpy()
+    rng = np.random.default_rng(seed)
+    masks = np.array([need | land for need, land, _ in engine.table], dtype=np.uint64)
+    needs = np.array([need for need, _, _ in engine.table], dtype=np.uint64)
+    games = np.full(size, state, dtype=np.uint64)
+    weights = np.ones(size)
+    ends = np.zeros(size, dtype=np.int64)
+    going = np.arange(size)
+    left = pegs
+    while len(going):
+        legal = games[going, None] & masks == needs
+        choices = legal.sum(axis=1)
+        over = choices == 0
+        ends[going[over]] = left
+        going, legal, choices = going[~over], legal[~over], choices[~over]
+        if not len(going):
+            break
+        picks = (rng.random(len(going)) * choices).astype(np.int64)
+        moves = (legal.cumsum(axis=1) > picks[:, None]).argmax(axis=1)
+        games[going] ^= masks[moves]
+        weights[going] *= choices
+        left -= 1
+
+    result = [size, dict(), dict(), float((weights * weights).sum())]
+    for left in np.unique(ends):
+        mine = weights[ends == left]
+        result[1][int(left)] = float(mine.sum())
+        result[2][int(left)] = float((mine * mine).sum())
+    return result
@@ -0,0 +1,178 @@
+#
+# Parallel versions of Engine.solve() and Engine.hint(). The search tree is
+#   expanded a few moves deep, and every distinct position on that frontier is
+#   sent as a small (state, pegs) pair to a pool of worker processes. Results
+#   are merged back in a fixed order, so they do not depend on the number of
+#   workers.
+#
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext as _nothing
+
+from stats import SearchStats
+from table import TranspositionTable
+
+# Default number of moves expanded before the frontier is handed to workers
+DEPTH = 3
+
+# Worker process state, set up once per process by _start()
+#
+# engine    ->  the Engine of the board being searched
+# table     ->  TranspositionTable of histograms shared by every solve task
+#                   the worker runs
+# bests     ->  TranspositionTable of best cases shared by every hint task
+_engine = None
+_table = None
+_bests = None
+
+
+def _start(engine):
+    global _engine, _table, _bests
+    _engine = engine
+    _table = TranspositionTable()
+    _bests = TranspositionTable()
+
+
+# A task is (state, pegs, instrument). Returns [result, stats], where stats
+# is the SearchStats of the task if instrument is True and None otherwise.
+def _solve(task):
+    state, pegs, instrument = task
+    if not instrument:
+        return [_engine.solve(state, pegs, _table), None]
+    stats = SearchStats("solve", pegs)
+    with stats.watch(_table):
+        return [_engine.solve(state, pegs, _table, stats), stats]
+
+
+def _best(task):
+    state, pegs, instrument = task
+    if not instrument:
+        return [_engine.best(state, pegs, _bests), None]
+    stats = SearchStats("hint", pegs)
+    with stats.watch(_bests):
+        return [_engine.best(state, pegs, _bests, stats), stats]
+
+
+# Run `function` on every task in a process pool and return the results in
+# task order. Merges the SearchStats of the tasks into `stats`, if given.
+def _run(engine, function, tasks, workers, stats):
+    workers = worker_count(workers)
+    chunk = max(1, len(tasks) // (8 * workers))
+    with ProcessPoolExecutor(workers, initializer=_start, initargs=(engine,)) as pool:
+        results = []
+        for result, task_stats in pool.map(function, tasks, chunksize=chunk):
+            results.append(result)
+            if stats is not None:
+                stats.merge(task_stats)
+    return results
+
+
+# Return the number of worker processes to use.
+#
+# workers   ->  requested number of workers, None for one per CPU
+def worker_count(workers):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(1, workers)
+
+
+# Return [positions, counts] for the positions `depth` moves away from
+# `state`. positions maps the key of every distinct frontier position to
+# [state, paths], the number of move orders leading to it. counts is the
+# histogram of the games that end before reaching the frontier.
+#
+# engine    ->  Engine of the board
+# state     ->  the packed board
+# pegs      ->  number of pegs on the board
+# depth     ->  number of moves to expand
+# stats     ->  SearchStats to count into, or None
+def frontier(engine, state, pegs, depth, stats=None):
+    positions = { engine.key(state): [state, 1] }
+    counts = dict()
+    for _ in range(depth):
+        expanded = dict()
+        for state, paths in positions.values():
+            if stats is not None:
+                stats.node(pegs)
+            moves = engine.legal_moves(state)
+            if not moves:
+                if stats is not None:
+                    stats.leaves += 1
+                counts[pegs] = counts.get(pegs, 0) + paths
+            for k in moves:
+                child = state ^ engine.table[k][2]
+                key = engine.key(child)
+                if key in expanded:
+                    expanded[key][1] += paths
+                else:
+                    expanded[key] = [child, paths]
+        positions = expanded
+        pegs -= 1
+    return [positions, counts]
+
+
+# Return the same histogram as Engine.solve(), using `workers` processes.
+#
+# engine    ->  Engine of the board
+# state     ->  the packed board
+# pegs      ->  number of pegs on the board
+# workers   ->  number of worker processes, None for one per CPU
+# depth     ->  number of moves expanded before handing out work
+# stats     ->  SearchStats to count into, or None. Worker searches are
+#                   merged into it
+def solve(engine, state, pegs, workers=None, depth=DEPTH, stats=None):
+    depth = min(depth, max(0, pegs - 1))
+    instrument = stats is not None
+    with stats.phase("frontier") if instrument else _nothing():
+        positions, counts = frontier(engine, state, pegs, depth, stats)
+        order = sorted(positions)
+        tasks = [(positions[key][0], pegs - depth, instrument) for key in order]
+    with stats.phase("workers") if instrument else _nothing():
+        results = _run(engine, _solve, tasks, workers, stats)
+    for key, result in zip(order, results):
+        paths = positions[key][1]
+        for left, num in result.items():
+            counts[left] = counts.get(left, 0) + num * paths
+    return counts
+
+
+# Return the same [best_case, move] as Engine.hint(), using `workers`
+# processes.
+#
+# engine    ->  Engine of the board
+# state     ->  the packed board
+# pegs      ->  number of pegs on the board
+# workers   ->  number of worker processes, None for one per CPU
+# depth     ->  number of moves expanded before handing out work
+# stats     ->  SearchStats to count into, or None. Worker searches are
+#                   merged into it
+def hint(engine, state, pegs, workers=None, depth=DEPTH, stats=None):
+    if pegs == 1:
+        return [pegs, None]
+    depth = max(1, min(depth, pegs - 1))
+    instrument = stats is not None
+
+    # every distinct position `depth` moves away, searched in parallel
+    with stats.phase("frontier") if instrument else _nothing():
+        positions, _ = frontier(engine, state, pegs, depth, stats)
+        order = sorted(positions)
+        tasks = [(positions[key][0], pegs - depth, instrument) for key in order]
+    with stats.phase("workers") if instrument else _nothing():
+        bests = dict(zip(order, _run(engine, _best, tasks, workers, stats)))
+
+    # back the results up to the root, as Engine.hint() would
+    def best(state, pegs, left):
+        if left == 0:
+            return bests[engine.key(state)]
+        result = pegs
+        for k in engine.legal_moves(state):
+            result = min(result, best(state ^ engine.table[k][2], pegs - 1, left - 1))
+        return result
+
+    best_case, move = pegs, None
+    for k in engine.legal_moves(state):
+        result = best(state ^ engine.table[k][2], pegs - 1, depth - 1)
+        if move is None or result < best_case:
+            best_case, move = result, k
+    return [best_case, move]
@@ -3,13 +3,10 @@
 #
 
 # FUTURE CONTENT
-# TODO: Implement a peg solitaire mode (rectangle) and the choice to play 
-#           either that or the existing triangular mode.
-#       Find some useful application for playback of a peg game, something that 
+# TODO: Find some useful application for playback of a peg game, something that 
 #           is already possible but not available to the user.
-#       Experiment with bidirectional DFS instead of the existing DFS
 
-from board import *
+from board import pegboard
 from turn import Turn
 import interface
 
@@ -24,15 +21,10 @@ def main():
         
         board = None
         while board is None:
-            print("Would you like a 15 or 21-peg board? (15 - normal, 21 - large)")
+            print("Would you like a 15, 21, 33 or 37-peg board? (15 - normal, 21 - large, 33 - English cross, 37 - European cross)")
             size = int(interface.input_handler(board, "board_size")[0])
-            if size == 21:
-                print("Warning: the `solve` command with this board size is too slow to be feasible.")
-                print("It is not recommended that you use this command early-game.")
-                print("Press the `Enter` key to proceed at your own risk.")
-                input()
             # initialize the peg board, determining which holes are adjacent to each other
-            board = triangle(size)
+            board = pegboard(size)
 
         print("There are {} pegs and {} holes".format(board.pegs_left, board.size))
         
@@ -42,7 +34,7 @@ def main():
         start = interface.input_handler(board, "starting_hole")[0]
 
         print("You chose hole {}!".format(start))
-        board.hole(start).has_peg = False
+        board.remove_peg(board.hole(start))
 
         # query user input. ask_for_move() will only return when game is over
         hints_used = interface.ask_for_move(board, hints)
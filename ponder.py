@@ -0,0 +1,86 @@
+#
+# Pondering: searching in the background while the player thinks. The
+#   interface spends most of a game waiting in input(), so a worker thread
+#   uses that time to search the current board and the boards one move away,
+#   most promising first. What it works out goes into the board's `hints`
+#   table (and its persistent cache, if any), which hint() reads from, so a
+#   hint asked for after pondering usually comes back at once.
+#
+#   Pondering is bounded: every board gets at most `budget` seconds, only
+#   `limit` boards are searched per wait, and the table it fills is capped
+#   like any other. It is stopped before the player's input is handled, and
+#   stops within a few hundred positions of being asked to.
+#
+
+import threading
+
+import anytime
+
+# Default number of seconds spent on each board
+BUDGET = 2.0
+
+# Default number of boards searched per wait
+LIMIT = 16
+
+class Ponderer:
+
+
+    # board     ->  the pegboard to ponder on
+    # budget    ->  number of seconds spent on each board
+    # limit     ->  number of boards searched per wait
+    # thread    ->  the worker thread while pondering, None otherwise
+    # cancel    ->  threading.Event telling the worker to stop
+    # pondered  ->  number of boards fully worked out so far
+    def __init__(self, board, budget=BUDGET, limit=LIMIT):
+        self.board = board
+        self.budget = budget
+        self.limit = limit
+        self.thread = None
+        self.cancel = threading.Event()
+        self.pondered = 0
+
+
+    # Start pondering on the board as it is now. Does nothing if already
+    # pondering.
+    def start(self):
+        if self.thread is not None:
+            return
+        self.cancel.clear()
+        board = self.board
+        self.thread = threading.Thread(target=self.run, args=(board.state, board.pegs_left),
+                                       name="ponder", daemon=True)
+        self.thread.start()
+
+
+    # Stop pondering and wait for the worker to finish, which it does within
+    # a few hundred positions.
+    def stop(self):
+        if self.thread is None:
+            return
+        self.cancel.set()
+        self.thread.join()
+        self.thread = None
+
+
+    # Worker thread. Searches `state`, then the boards one move away from it
+    # in order of their lower bound, until cancelled or out of boards.
+    #
+    # state ->  the packed board when pondering started
+    # pegs  ->  number of pegs on it
+    def run(self, state, pegs):
+        board = self.board
+        engine, bounds = board.engine, board.bounds
+        children = [state ^ engine.table[k][2] for k in engine.legal_moves(state)]
+        children.sort(key=lambda child: bounds.lower(child, pegs - 1))
+        queue = [(state, pegs)] + [(child, pegs - 1) for child in children]
+        for state, pegs in queue[:self.limit]:
+            if self.cancel.is_set():
+                return
+            if pegs == 1 or not engine.legal_moves(state):
+                continue
+            best_case, move, proven = anytime.hint(engine, bounds, state, pegs, self.budget,
+                                                   board.hints, cancel=self.cancel)
+            if proven:
+                self.pondered += 1
+                if board.cache is not None:
+                    board.cache.store(engine, state, best_case, [move])
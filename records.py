@@ -0,0 +1,364 @@
+#
+# Game records: a compact binary format for whole games, and a streaming
+#   export of every game (or every winning game) from a position. A game is
+#   stored as the indices of its moves in Engine.moves, one byte each on every
+#   board with up to 256 moves, after a small header naming the board and the
+#   position the games start from. Games are written as they are found, so an
+#   export never holds more than the game being played out.
+#
+# File layout (little-endian):
+#   header  ->  MAGIC, VERSION (u16), width (u16, bytes per move), then the
+#                   header of endgame.header_for() for the board (its size,
+#                   number of moves and move digest), then the starting board
+#                   packed into (size + 7) // 8 bytes
+#   records ->  one per game, back to back:
+#                   length  ->  number of moves (u8)
+#                   moves   ->  index of every move, `width` bytes each
+#
+# Usage: python records.py export size [--start hole] [--wins] file
+#        python records.py show file [game] [--turn n]
+#        python records.py check
+#
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from bounds import can_win
+from endgame import HEADER as GEOMETRY, header_for
+import geometry
+from table import TranspositionTable
+
+MAGIC = b"PEGR"
+VERSION = 1
+HEADER = struct.Struct("<4sHH")
+
+class GameRecords:
+
+
+    # Constructor: use open_records() rather than calling this directly.
+    #
+    # file      ->  the open record file
+    # data      ->  read-only memory map of the file
+    # geometry  ->  Geometry of the board the games were played on
+    # start     ->  the packed board every game starts from
+    # width     ->  bytes per move
+    # first     ->  offset of the first record
+    # offsets   ->  array of the offset of every record, built the first time
+    #                   a game is asked for by number
+    def __init__(self, file, data, geometry, start, width, first):
+        self.file = file
+        self.data = data
+        self.geometry = geometry
+        self.start = start
+        self.width = width
+        self.first = first
+        self.offsets = None
+
+
+    def __len__(self):
+        return len(self.index())
+
+
+    # Return game n (counting from 0) as a GameRecord.
+    #
+    # n ->  index of the game
+    def __getitem__(self, n):
+        offsets = self.index()
+        if n < 0:
+            n += len(offsets)
+        if not 0 <= n < len(offsets):
+            raise IndexError("game index out of range")
+        return self.read(offsets[n])
+
+
+    # Yield every game in file order, without building the index.
+    def __iter__(self):
+        offset = self.first
+        while offset < len(self.data):
+            game = self.read(offset)
+            yield game
+            offset += 1 + len(game.moves) * self.width
+
+
+    # Return the GameRecord at `offset`.
+    def read(self, offset):
+        length = self.data[offset]
+        moves = array("B" if self.width == 1 else "H")
+        moves.frombytes(self.data[offset + 1:offset + 1 + length * self.width])
+        if sys.byteorder != "little" and self.width > 1:
+            moves.byteswap()
+        return GameRecord(self.geometry, self.start, moves)
+
+
+    # Return the offset of every record, finding them on first use.
+    def index(self):
+        if self.offsets is None:
+            offsets, offset, data, width = array("Q"), self.first, self.data, self.width
+            while offset < len(data):
+                offsets.append(offset)
+                offset += 1 + data[offset] * width
+            self.offsets = offsets
+        return self.offsets
+
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+#
+# One game of a record file.
+#
+class GameRecord:
+
+
+    # geometry  ->  Geometry of the board the game was played on
+    # start     ->  the packed board the game starts from
+    # moves     ->  array of the index of every move, in Engine.moves order
+    def __init__(self, geometry, start, moves):
+        self.geometry = geometry
+        self.start = start
+        self.moves = moves
+
+
+    def __len__(self):
+        return len(self.moves)
+
+
+    # Return the packed board right after `turn` moves, without building a
+    # Board.
+    #
+    # turn  ->  number of moves played, every move if None
+    def state(self, turn=None):
+        state, table = self.start, self.geometry.engine.table
+        for move in self.moves[:turn]:
+            state ^= table[move][2]
+        return state
+
+
+    # Return a new Board set up as it was right after `turn` moves, with those
+    # moves in its log, so that it can be rewound or played on from there.
+    #
+    # turn  ->  number of moves played, every move if None
+    def board(self, turn=None):
+        from board import Board
+
+        board = Board(self.geometry)
+        for hole in board.holes:
+            if not self.start >> hole.index & 1:
+                board.remove_peg(hole)
+        board.pegs_left = self.start.bit_count()
+        for move in self.moves[:turn]:
+            h, i, j = (board.holes[k] for k in board.engine.moves[move])
+            if not board.hop_peg(h, i, j):
+                raise ValueError("move {} of the record can not be made".format(move))
+        return board
+
+
+# ---------------------------------
+# STATIC FUNCTIONS BEYOND THIS POINT
+# ---------------------------------
+
+
+# Yield every game from `state` as a tuple of move indices, in table order of
+# their moves, playing each one out depth first. Only the game being played
+# out is held in memory.
+#
+# engine    ->  Engine of the board
+# bounds    ->  Bounds of the board
+# state     ->  the packed board
+# pegs      ->  number of pegs on the board
+# wins_only ->  whether to only yield games that end with a single peg. Moves
+#                   that can not lead to one are never played
+# table     ->  TranspositionTable of results shared with Board.hint(), used
+#                   to tell which moves can still lead to a win. A new one by
+#                   default
+def games(engine, bounds, state, pegs, wins_only=False, table=None):
+    if wins_only:
+        if table is None:
+            table = TranspositionTable()
+        if not can_win(engine, bounds, state, pegs, table):
+            return
+
+    # stack holds [state, pegs, moves, n] for every position of the game being
+    # played out, where n counts the moves already tried from it. Children are
+    # only asked whether they can still be won once they are reached, so the
+    # first games come out without proving every sibling on the way lost
+    path, stack = [], [[state, pegs, engine.legal_moves(state), 0]]
+    while stack:
+        frame = stack[-1]
+        state, pegs, moves, n = frame
+        if not moves:
+            yield tuple(path)
+        while n < len(moves):
+            k = moves[n]
+            n += 1
+            child = state ^ engine.table[k][2]
+            if not wins_only or can_win(engine, bounds, child, pegs - 1, table):
+                break
+        else:
+            stack.pop()
+            if path:
+                path.pop()
+            continue
+        frame[3] = n
+        path.append(k)
+        stack.append([child, pegs - 1, engine.legal_moves(child), 0])
+
+
+# Write games to a record file and return the number written. `games` can be
+# any iterable of move index sequences, such as games() or a single game, and
+# is read one game at a time.
+#
+# path      ->  file to write
+# engine    ->  Engine of the board
+# start     ->  the packed board every game starts from
+# games     ->  iterable of sequences of move indices
+def write(path, engine, start, games):
+    width = 1 if len(engine.moves) <= 1 << 8 else 2
+    code = "B" if width == 1 else "H"
+    count = 0
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, width))
+        file.write(header_for(engine))
+        file.write(start.to_bytes((engine.size + 7) // 8, "little"))
+        for game in games:
+            file.write(bytes((len(game),)))
+            file.write(struct.pack("<{}{}".format(len(game), code), *game))
+            count += 1
+    return count
+
+
+# Write the game played so far on `board` to a record file.
+#
+# board ->  the pegboard
+# path  ->  file to write
+def save(board, path):
+    moves = tuple(board.log.moves[:len(board.log)])
+    start = board.state
+    for move in moves:
+        start ^= board.engine.table[move][2]
+    write(path, board.engine, start, [moves])
+
+
+# Return the GameRecords in the file at `path`. Raises ValueError if it is not
+# a record file or was written for a board that is not known.
+#
+# path  ->  file to read
+def open_records(path):
+    file = open(path, "rb")
+    try:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        file.close()
+        raise ValueError("{} is not a record file".format(path)) from None
+    try:
+        magic, version, width = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a record file".format(path))
+        geometry_header = data[HEADER.size:HEADER.size + GEOMETRY.size]
+        shape = geometry.for_size(GEOMETRY.unpack(geometry_header)[2])
+        if shape is None or header_for(shape.engine) != geometry_header:
+            raise ValueError("{} was written for an unknown board".format(path))
+        first = HEADER.size + GEOMETRY.size + (shape.size + 7) // 8
+        start = int.from_bytes(data[HEADER.size + GEOMETRY.size:first], "little")
+    except (ValueError, struct.error) as error:
+        data.close()
+        file.close()
+        raise ValueError(str(error)) from None
+    return GameRecords(file, data, shape, start, width, first)
+
+
+# Play a few moves on every standard board, save them with save(), and read
+# them back with open_records(). Returns the problems found, as messages.
+def check():
+    from board import pegboard
+
+    problems = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in geometry.STANDARD:
+            board = pegboard(size)
+            board.remove_peg(board.holes[0])
+            for _ in range(3):
+                h, i, j = (board.holes[k] for k in board.engine.moves[board.engine.legal_moves(board.state)[0]])
+                board.hop_peg(h, i, j)
+            path = os.path.join(directory, "{}.pegr".format(size))
+            save(board, path)
+            records = open_records(path)
+            try:
+                games = [list(game.moves) for game in records]
+                played = list(board.log.moves[:len(board.log)])
+                if games != [played]:
+                    problems.append("{} holes: read back {}, expected [{}]".format(size, games, played))
+                elif records[0].board().state != board.state:
+                    problems.append("{} holes: replayed game ends on another board".format(size))
+            except ValueError as error:
+                problems.append("{} holes: {}".format(size, error))
+            records.close()
+    return problems
+
+
+def main(args):
+    from board import pegboard
+
+    parser = argparse.ArgumentParser(description="Export and replay Peg Game records")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write every game from a starting hole to a file")
+    export.add_argument("size", type=int, help="number of holes on the board")
+    export.add_argument("file", help="record file to write")
+    export.add_argument("--start", default="a", help="name of the empty hole (default a)")
+    export.add_argument("--wins", action="store_true", help="only write games ending with a single peg")
+    show = commands.add_parser("show", help="replay a game of a record file")
+    show.add_argument("file", help="record file to read")
+    show.add_argument("game", type=int, nargs="?", default=0, help="index of the game (default 0)")
+    show.add_argument("--turn", type=int, help="show the board after this many moves (default all)")
+    commands.add_parser("check", help="save games and read them back")
+    options = parser.parse_args(args)
+
+    if options.command == "check":
+        problems = check()
+        for problem in problems:
+            print(problem)
+        print("{} problems found".format(len(problems)) if problems else "ok")
+        return 1 if problems else 0
+
+    if options.command == "export":
+        board = pegboard(options.size)
+        if board is None:
+            return 1
+        hole = board.hole(options.start)
+        if hole is None:
+            print("No hole named {}".format(options.start))
+            return 1
+        board.remove_peg(hole)
+        count = write(options.file, board.engine, board.state,
+                      games(board.engine, board.bounds, board.state, board.pegs_left, options.wins))
+        print("Wrote {} games to {}".format(count, options.file))
+        return 0
+
+    try:
+        records = open_records(options.file)
+    except (OSError, ValueError) as error:
+        print(error)
+        return 1
+    total = len(records)
+    if not -total <= options.game < total:
+        print("There are only {} games in {}".format(total, options.file))
+        records.close()
+        return 1
+    game = records[options.game]
+    board = game.board(options.turn)
+    records.close()
+    print("Game {} of {}, turn {} of {}".format(options.game % total, total, len(board.log), len(game)))
+    for turn in board.log:
+        print("  " + str(turn))
+    print(board)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,239 @@
+#
+# A game server hosting many sessions (see session.py) in one process. Clients
+#   connect over a local socket and send one JSON request per line, getting
+#   one JSON response per line back:
+#
+#   {"op": "create", "size": 15, "start": "e"}     ->  state of the new game
+#   {"op": "move", "session": "1", "src": "l", "dest": "e"}  ->  new state
+#   {"op": "state", "session": "1"}                 ->  state of the game
+#   {"op": "hint", "session": "1"}                  ->  best case and move
+#   {"op": "solve", "session": "1"}                 ->  histogram of outcomes
+#   {"op": "close", "session": "1"}                 ->  ends the game
+#   {"op": "stats"}                                 ->  counters of the server
+#
+#   Every response has "ok", and "error" when it is false. An "id" given with
+#   a request is sent back with its response. Requests on one connection are
+#   answered in order; clients wanting several in flight open several
+#   connections. A session lasts until it is closed, or until every
+#   connection that created or used it has gone away.
+#
+#   Moves and states are answered on the event loop. Hints and solves are run
+#   in a pool of worker processes, and their results kept in a table shared by
+#   every session: players reaching the same position (up to symmetry, for
+#   solves) get the same answer without a second search, and players asking
+#   while it is being searched wait for that search rather than starting
+#   another. The workers also read and fill the persistent cache (see
+#   cache.py) when it exists, so results outlive the server. Hints and
+#   solves are limited in time (see session.py), so that a large board never
+#   holds a worker for long. Their results say whether they are exact, and
+#   only exact ones are kept for reuse.
+#
+# Usage: python server.py [--socket PATH | --port N] [--workers N] [--cache]
+#
+
+import argparse
+import asyncio
+import json
+import os
+import stat
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import open_cache
+from session import analyse, Sessions, SessionError
+from table import TranspositionTable
+
+# Where the server listens by default
+SOCKET = os.path.join(tempfile.gettempdir(), "peg_game.sock")
+
+# Default number of hint and solve results kept for reuse
+CAPACITY = 1 << 16
+
+# Longest request line accepted, in bytes
+LIMIT = 1 << 16
+
+# Ops carried out on the session a request names
+SESSION_OPS = ("state", "move", "hint", "solve", "close")
+
+class Server:
+
+
+    # sessions  ->  the Sessions being played
+    # pool      ->  ProcessPoolExecutor running hints and solves
+    # results   ->  TranspositionTable mapping (kind, size, position) to the
+    #                   result of a finished hint or solve
+    # pending   ->  dictionary mapping the same keys to the future of every
+    #                   hint or solve still running
+    # requests  ->  number of requests answered
+    # searches  ->  number of hints and solves sent to the pool
+    # reused    ->  number of hints and solves answered by another search
+    def __init__(self, workers=None, capacity=CAPACITY):
+        self.sessions = Sessions()
+        self.pool = ProcessPoolExecutor(workers)
+        self.results = TranspositionTable(capacity)
+        self.pending = dict()
+        self.requests = 0
+        self.searches = 0
+        self.reused = 0
+
+
+    # Listen on the Unix socket at `path`, or on `port` of the loopback
+    # interface if one is given, until cancelled.
+    async def serve(self, path=SOCKET, port=None):
+        if port is not None:
+            server = await asyncio.start_server(self.handle, "127.0.0.1", port, limit=LIMIT)
+        else:
+            if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+                os.remove(path)     # left behind by a server that is gone
+            server = await asyncio.start_unix_server(self.handle, path, limit=LIMIT)
+        async with server:
+            await server.serve_forever()
+
+
+    # Answer the requests of one connection until it is closed, then end the
+    # sessions no other connection holds.
+    async def handle(self, reader, writer):
+        held = set()    # ids of the sessions this connection created or used
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.respond(line, held)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass    # the client went away, or sent a line over LIMIT
+        finally:
+            for id in held:
+                self.sessions.release(id)
+            writer.close()
+
+
+    # Return the response to one request line.
+    #
+    # line  ->  the request, as bytes
+    # held  ->  set of the ids of the sessions held by the connection it came
+    #               from, which sessions it creates or uses are added to
+    async def respond(self, line, held):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return { "ok": False, "error": "requests must be JSON" }
+        if not isinstance(request, dict):
+            return { "ok": False, "error": "requests must be JSON objects" }
+        self.requests += 1
+        try:
+            response = dict(await self.dispatch(request, held), ok=True)
+        except SessionError as error:
+            response = { "ok": False, "error": str(error) }
+        except Exception as error:     # a worker died, or a request was malformed
+            response = { "ok": False, "error": "{}: {}".format(type(error).__name__, error) }
+        if "id" in request:
+            response["id"] = request["id"]
+        return response
+
+
+    # Helper method for respond. Carries out a request and returns its result.
+    async def dispatch(self, request, held):
+        op = request.get("op")
+        if op == "create":
+            session = self.sessions.create(request.get("size", 15), request.get("start", "a"))
+            held.add(session.id)
+            self.sessions.hold(session.id)
+            return session.state()
+        if op == "stats":
+            return {
+                "sessions": len(self.sessions),
+                "requests": self.requests,
+                "searches": self.searches,
+                "reused": self.reused,
+                "results": len(self.results),
+                "pending": len(self.pending),
+            }
+        if op not in SESSION_OPS:
+            raise SessionError("unknown op {}".format(op))
+        session = self.sessions.get(request.get("session"))
+        if session.id not in held:
+            held.add(session.id)
+            self.sessions.hold(session.id)
+        match op:
+            case "state":
+                return session.state()
+            case "move":
+                return session.move(request.get("src"), request.get("dest"))
+            case "hint" | "solve":
+                return dict(await self.analyse(session, op), session=session.id)
+            case "close":
+                self.sessions.close(session.id)
+                return { "session": session.id }
+
+
+    # Return the result of `kind` of analysis (one of KINDS) of the position
+    # of `session`, from the shared results if it is there and from the pool
+    # otherwise.
+    async def analyse(self, session, kind):
+        key = (kind,) + session.key(canonical=kind == "solve")
+        result = self.results.get(key)
+        if result is not None:
+            self.reused += 1
+            return result
+        future = self.pending.get(key)
+        if future is None:
+            self.searches += 1
+            loop = asyncio.get_running_loop()
+            future = asyncio.ensure_future(loop.run_in_executor(self.pool, analyse, kind, session.job()))
+            future.add_done_callback(lambda done: self.finish(key, done))
+            self.pending[key] = future
+        else:
+            self.reused += 1
+        # a client going away must not cancel a search others wait for
+        return await asyncio.shield(future)
+
+
+    # Helper method for analyse. Moves a finished search from `pending` into
+    # `results`, unless it ran out of time.
+    def finish(self, key, future):
+        del self.pending[key]
+        if not future.cancelled() and future.exception() is None:
+            result = future.result()
+            if result.get("proven", True) and result.get("complete", True):
+                self.results.put(key, result)
+
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Serve Peg Game sessions over a local socket")
+    parser.add_argument("--socket", default=SOCKET, help="Unix socket to listen on (default {})".format(SOCKET))
+    parser.add_argument("--port", type=int, help="listen on this TCP port of 127.0.0.1 instead")
+    parser.add_argument("--workers", type=int, help="processes running hints and solves (default one per CPU)")
+    parser.add_argument("--capacity", type=int, default=CAPACITY,
+                        help="hint and solve results kept for reuse (default {})".format(CAPACITY))
+    parser.add_argument("--cache", action="store_true",
+                        help="create the persistent cache if there is none, so results outlive the server")
+    options = parser.parse_args(args)
+    if options.port is None and not hasattr(asyncio, "start_unix_server"):
+        parser.error("Unix sockets are not supported here; use --port")
+
+    if options.cache:
+        cache = open_cache(create=True)
+        if cache is not None:
+            cache.close()
+    server = Server(options.workers, options.capacity)
+    print("Serving on {}".format(options.socket if options.port is None else "127.0.0.1:{}".format(options.port)),
+          flush=True)
+    try:
+        asyncio.run(server.serve(options.socket, options.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
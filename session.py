@@ -0,0 +1,216 @@
+#
+# Headless game sessions: the game as a set of calls (create a game, move,
+#   hint, solve, state) rather than a loop around input() and print(). Every
+#   call returns a dictionary that can be sent as JSON as it is, and a call
+#   that can not be carried out raises SessionError with a message for the
+#   player. Used by server.py, and usable from any other front end.
+#
+#   hint() and solve() search on the session's own board. A front end that
+#   wants to search elsewhere, such as in a worker process, sends job() there
+#   and runs analyse() on it instead. Both are limited in time, so that no
+#   board ties up whatever runs them: a hint gives the best move found within
+#   HINT_BUDGET seconds, with "proven" telling whether it is known to be the
+#   best, and a solve stops after SOLVE_BUDGET seconds, with "complete"
+#   telling whether every game was counted.
+#
+
+import threading
+from itertools import count
+
+from batch import position
+from board import Board
+import geometry
+
+# Analyses analyse() can run
+KINDS = ("hint", "solve")
+
+# Number of seconds a hint searches for, and a solve runs for, before giving
+# what it has found so far
+HINT_BUDGET = 5.0
+SOLVE_BUDGET = 30.0
+
+class SessionError(Exception):
+    pass
+
+class Session:
+
+
+    # Constructor: use Sessions.create() rather than calling this directly.
+    #
+    # id        ->  name of the session, unique among its Sessions
+    # board     ->  the pegboard being played on
+    # start     ->  name of the hole that started the game empty
+    # moves     ->  every move made so far, as [src, dest] hole names
+    # holders   ->  number of connections using the session (see
+    #                   Sessions.hold)
+    def __init__(self, id, board, start):
+        self.id = id
+        self.board = board
+        self.start = start
+        self.moves = []
+        self.holders = 0
+
+
+    # Move the peg in hole `src` to hole `dest`, and return the new state.
+    #
+    # src   ->  name of the hole occupied by the peg
+    # dest  ->  name of the empty hole to be jumped to
+    def move(self, src, dest):
+        board = self.board
+        l, m = board.hole(src), board.hole(dest)
+        if l is None or m is None or m not in l.adj_holes or not board.hop_peg(l, l.adj_holes[m], m):
+            raise SessionError("illegal move {}-{}".format(src, dest))
+        self.moves.append([src, dest])
+        return self.state()
+
+
+    # Return the best case and the move leading to it, as analyse() does.
+    def hint(self):
+        return _hint(self.board)
+
+
+    # Return the number of games ending with each number of pegs, as
+    # analyse() does.
+    def solve(self):
+        return _solve(self.board)
+
+
+    # Return the state of the game: the occupation of every hole ("1" for a
+    # peg, in hole order), the number of pegs left, the legal moves and
+    # whether the game is over or won.
+    def state(self):
+        board = self.board
+        return {
+            "session": self.id,
+            "size": board.size,
+            "holes": "".join("1" if board.has_peg(hole) else "0" for hole in board.holes),
+            "pegs": board.pegs_left,
+            "moves": ["{}-{}".format(h.name, j.name) for h, _, j in board.legal_moves()],
+            "over": not board.has_moves(),
+            "won": board.win(),
+        }
+
+
+    # Return [size, start, moves], which is all analyse() needs to set up the
+    # same position elsewhere.
+    def job(self):
+        return [self.board.size, self.start, [list(move) for move in self.moves]]
+
+
+    # Return a key shared by every session in this position, up to rotation
+    # and reflection of the board when `canonical` is set.
+    def key(self, canonical=False):
+        board = self.board
+        return (board.size, board.engine.key(board.state) if canonical else board.state)
+
+
+class Sessions:
+
+
+    # sessions  ->  dictionary mapping an id to its Session
+    # ids       ->  counter giving out ids
+    def __init__(self):
+        self.sessions = dict()
+        self.ids = count(1)
+
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+    # Start a game on a board of `size` holes with hole `start` empty, and
+    # return its Session.
+    #
+    # size  ->  number of holes
+    # start ->  name of the hole to empty
+    def create(self, size, start):
+        shape = geometry.for_size(size) if isinstance(size, int) else None
+        if shape is None:
+            raise SessionError("no board of {} holes".format(size))
+        board = Board(shape)
+        hole = board.hole(start)
+        if hole is None:
+            raise SessionError("no hole named {}".format(start))
+        board.remove_peg(hole)
+        session = Session(str(next(self.ids)), board, start)
+        self.sessions[session.id] = session
+        return session
+
+
+    # Return the session with the given id.
+    def get(self, id):
+        session = self.sessions.get(id)
+        if session is None:
+            raise SessionError("no session {}".format(id))
+        return session
+
+
+    # End the session with the given id.
+    def close(self, id):
+        self.get(id)
+        del self.sessions[id]
+
+
+    # Note that a connection uses the session with the given id. The session
+    # is kept until it is closed or every connection holding it is released.
+    def hold(self, id):
+        self.get(id).holders += 1
+
+
+    # Note that a connection holding the session with the given id is gone,
+    # and end the session if no other connection holds it.
+    def release(self, id):
+        session = self.sessions.get(id)
+        if session is not None:
+            session.holders -= 1
+            if session.holders <= 0:
+                del self.sessions[id]
+
+
+# ---------------------------------
+# STATIC FUNCTIONS BEYOND THIS POINT
+# ---------------------------------
+
+
+# Return the result of `kind` of analysis of the position set up by a job of
+# Session.job(). Meant to be run in a worker process, where boards of the
+# same size share their transposition tables and the persistent cache (see
+# batch.position).
+#
+# kind  ->  one of KINDS
+# job   ->  [size, start, moves]
+def analyse(kind, job):
+    board = position(*job)
+    if isinstance(board, str):
+        raise SessionError(board)
+    return _hint(board) if kind == "hint" else _solve(board)
+
+
+# Helper method for Session.hint and analyse.
+def _hint(board):
+    best_case, l, m, proven = board.hint(budget=HINT_BUDGET)
+    return {
+        "best": best_case,
+        "hint": None if l is None else "{}-{}".format(l.name, m.name),
+        "proven": proven,
+    }
+
+
+# Helper method for Session.solve and analyse. The solve is cancelled once
+# SOLVE_BUDGET seconds have passed, and then counts the games it finished.
+def _solve(board):
+    cancel = threading.Event()
+    timer = threading.Timer(SOLVE_BUDGET, cancel.set)
+    board.cancel = cancel
+    timer.start()
+    try:
+        counts = board.solve()
+    finally:
+        timer.cancel()
+        board.cancel = None
+    return {
+        "games": sum(counts.values()),
+        "wins": counts.get(1, 0),
+        "histogram": { str(left): counts[left] for left in sorted(counts) },
+        "complete": not cancel.is_set(),
+    }
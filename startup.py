@@ -0,0 +1,115 @@
+#
+# Startup benchmark for the game. Launches `python peg_game.py` over and over
+#   and times how long it takes to ask its first question, and to show the
+#   board once the questions before it are answered. Fails when the median
+#   of either misses its target, or when starting a game loads any of the
+#   heavy modules that only hint, solve and analyze need.
+#
+#   The board is built from the geometries cached on disk (see geometry.py),
+#   which the first launch writes if they are missing. That launch is not
+#   counted.
+#
+# Usage: python startup.py [--runs N] [--size N] [--target SECONDS]
+#            [--board-target SECONDS]
+#
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Median number of seconds the game may take to ask its first question, and
+# to show the board
+TARGET = 0.1
+BOARD_TARGET = 0.15
+
+# Text of the first question, and of the one asked right after the board is
+# shown
+FIRST_PROMPT = b"How many hints"
+BOARD_PROMPT = b"Choose a hole"
+
+# Modules no game may load before a hint, solve or analysis is asked for
+HEAVY = ("numpy", "sqlite3", "hashlib", "multiprocessing", "concurrent.futures", "cache",
+         "vectorized", "parallel", "montecarlo", "bidirectional", "anytime", "ponder")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Prints the heavy modules loaded once peg_game is imported and a board of
+# every size is built
+CHECK = """
+import sys
+import board, geometry, peg_game
+for size in geometry.STANDARD:
+    board.pegboard(size)
+print(" ".join(name for name in {} if name in sys.modules))
+""".format(HEAVY)
+
+
+# Launch the game once, answering `answers`, and return [first, shown]: the
+# seconds it took to ask its first question and to show the board.
+#
+# answers   ->  bytes typed into the game up front
+def launch(answers):
+    start = time.perf_counter()
+    game = subprocess.Popen([sys.executable, os.path.join(HERE, "peg_game.py")], cwd=HERE,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            env=dict(os.environ, PYTHONUNBUFFERED="1"))
+    game.stdin.write(answers)
+    game.stdin.flush()
+    output, first = b"", None
+    try:
+        while BOARD_PROMPT not in output:
+            chunk = game.stdout.read1(1 << 16)
+            if not chunk:
+                raise RuntimeError("the game ended before showing the board")
+            output += chunk
+            if first is None and FIRST_PROMPT in output:
+                first = time.perf_counter() - start
+        return [first, time.perf_counter() - start]
+    finally:
+        game.kill()
+        game.wait()
+
+
+# Return the heavy modules a game loads before any search, as a string.
+def heavy_modules():
+    return subprocess.run([sys.executable, "-c", CHECK], cwd=HERE, check=True,
+                          capture_output=True, text=True).stdout.strip()
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Measure how fast the Peg Game starts")
+    parser.add_argument("--runs", type=int, default=20, help="launches to time (default 20)")
+    parser.add_argument("--size", type=int, default=15, help="board size to ask for (default 15)")
+    parser.add_argument("--target", type=float, default=TARGET,
+                        help="median seconds to the first question (default {})".format(TARGET))
+    parser.add_argument("--board-target", type=float, default=BOARD_TARGET,
+                        help="median seconds to the board (default {})".format(BOARD_TARGET))
+    options = parser.parse_args(args)
+
+    answers = "0\n{}\n".format(options.size).encode()
+    launch(answers)     # writes the bytecode and the cached geometry if missing
+    times = [launch(answers) for _ in range(options.runs)]
+    failed = False
+    for name, values, target in (("first prompt", [first for first, _ in times], options.target),
+                                 ("board", [shown for _, shown in times], options.board_target)):
+        median = statistics.median(values)
+        print("{:<14} median {:.4f}s  min {:.4f}s  max {:.4f}s  target {:.4f}s".format(
+            name, median, min(values), max(values), target))
+        if median > target:
+            print("MISSED the {} target".format(name))
+            failed = True
+
+    heavy = heavy_modules()
+    if heavy:
+        print("Starting a game loads {}".format(heavy))
+        failed = True
+    else:
+        print("Starting a game loads none of {}".format(", ".join(HEAVY)))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
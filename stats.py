@@ -0,0 +1,156 @@
+#
+# Instrumentation for the searches behind hint() and solve(). A SearchStats
+#   object is handed down a search, which counts into it as it goes. Searches
+#   that are not given one skip all counting, so instrumentation costs nothing
+#   when it is turned off.
+#
+# A SearchStats can also carry a cancel event. Searches counting into it stop
+#   by raising Cancelled soon after the event is set.
+#
+
+import time
+from contextlib import contextmanager
+
+# Number of positions counted between two looks at the cancel event
+CHECK_EVERY = 256
+
+class Cancelled(Exception):
+    pass
+
+
+class SearchStats:
+
+
+    # kind      ->  which search was run, such as "hint" or "solve"
+    # pegs      ->  number of pegs on the board when the search started
+    # nodes     ->  positions visited, including those answered from a
+    #                   transposition table
+    # hops      ->  moves made by a depth-first search to reach a position
+    # rewinds   ->  moves a depth-first search undid to return from one. Less
+    #                   than hops when the search was stopped part way.
+    #                   Searches working layer by layer make no hops and
+    #                   count neither
+    # leaves    ->  positions from which no move can be made
+    # pruned    ->  branches cut without being searched
+    # lowest    ->  fewest pegs on any position visited
+    # hits      ->  transposition table lookups that found a result
+    # misses    ->  transposition table lookups that did not
+    # evictions ->  positions evicted from a transposition table
+    # phases    ->  dictionary mapping the name of each phase of the search to
+    #                   the number of seconds spent in it, in order
+    # done      ->  estimated fraction of the search finished, for progress
+    #                   displays. Only kept up to date by searches that can
+    #                   tell, 0 otherwise
+    # cancel    ->  threading.Event that stops the search once set, or None
+    def __init__(self, kind, pegs, cancel=None):
+        self.kind = kind
+        self.pegs = pegs
+        self.nodes = 0
+        self.hops = 0
+        self.rewinds = 0
+        self.leaves = 0
+        self.pruned = 0
+        self.lowest = pegs
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.phases = dict()
+        self.done = 0.0
+        self.cancel = cancel
+
+
+    # max_depth ->  number of moves between the root and the deepest position
+    @property
+    def max_depth(self):
+        return self.pegs - self.lowest
+
+
+    # Count a visit to a position with `pegs` pegs on it. Raises Cancelled
+    # if the search has been cancelled.
+    def node(self, pegs):
+        self.nodes += 1
+        if pegs < self.lowest:
+            self.lowest = pegs
+        if self.cancel is not None and self.nodes % CHECK_EVERY == 0:
+            self.check()
+
+
+    # Raise Cancelled if the search has been cancelled. For searches that do
+    # not count positions one at a time.
+    def check(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise Cancelled()
+
+
+    # Time the code run inside a `with` block as phase `name`.
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+
+    # Count the lookups and evictions of a transposition table made inside a
+    # `with` block.
+    @contextmanager
+    def watch(self, table):
+        hits, misses, evictions = table.hits, table.misses, table.evictions
+        try:
+            yield self
+        finally:
+            self.hits += table.hits - hits
+            self.misses += table.misses - misses
+            self.evictions += table.evictions - evictions
+
+
+    # Add the counts of another search, such as one run by a worker process.
+    #
+    # other ->  SearchStats of the other search
+    def merge(self, other):
+        self.nodes += other.nodes
+        self.hops += other.hops
+        self.rewinds += other.rewinds
+        self.leaves += other.leaves
+        self.pruned += other.pruned
+        self.lowest = min(self.lowest, other.lowest)
+        self.hits += other.hits
+        self.misses += other.misses
+        self.evictions += other.evictions
+
+
+    # Return the metrics as a dictionary, for logging or JSON output.
+    def as_dict(self):
+        return {
+            "kind": self.kind,
+            "pegs": self.pegs,
+            "nodes": self.nodes,
+            "hops": self.hops,
+            "rewinds": self.rewinds,
+            "max_depth": self.max_depth,
+            "leaves": self.leaves,
+            "pruned": self.pruned,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "phases": dict(self.phases),
+            "seconds": sum(self.phases.values()),
+        }
+
+
+    def __str__(self):
+        result = "Last search: {} from {} pegs\n".format(self.kind, self.pegs)
+        result += "  Positions visited: {}\n".format(self.nodes)
+        if self.hops:
+            result += "  Hops / rewinds:    {} / {}\n".format(self.hops, self.rewinds)
+        result += "  Deepest position:  {} moves ahead\n".format(self.max_depth)
+        result += "  Games finished:    {}\n".format(self.leaves)
+        result += "  Branches pruned:   {}\n".format(self.pruned)
+        lookups = self.hits + self.misses
+        if lookups:
+            result += "  Cache hits:        {} of {} ({}%), {} evicted\n".format(
+                self.hits, lookups, round(100 * self.hits / lookups, 2), self.evictions)
+        for name, seconds in self.phases.items():
+            result += "  Time in {}: {:.4f}s\n".format(name, seconds)
+        return result[:-1]  # remove the last newline
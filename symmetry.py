@@ -0,0 +1,185 @@
+#
+# Symmetries of a pegboard. Positions that are rotations or reflections of
+#   each other play out the same way, so anything learned about one of them
+#   holds for all of them. Mapping every position to a canonical form lets
+#   position caches and tables store each family of positions only once.
+#
+
+# Number of bits of a packed state translated per table lookup
+CHUNK = 8
+MASK = (1 << CHUNK) - 1
+
+class Symmetry:
+
+
+    # Constructor: relies on static functions like triangle_symmetries() to
+    # feed it the correct permutations.
+    #
+    # perms     ->  array of permutations of hole indices, one per element of
+    #                   the board's symmetry group. perms[t][k] is the hole
+    #                   that hole k is sent to by symmetry t. perms[0] is the
+    #                   identity
+    # tables    ->  per symmetry, one lookup table per CHUNK bits of a
+    #                   packed state, giving the image of those bits. Turns a
+    #                   permutation of single bits into a few lookups
+    # packed    ->  one lookup table per CHUNK bits, giving the images of
+    #                   those bits under every symmetry but the identity at
+    #                   once, each in its own `size`-bit field of a single int.
+    #                   canonical() builds all the images with one pass over
+    #                   the state instead of one pass per symmetry
+    def __init__(self, perms):
+        self.perms = perms
+        self.size = size = len(perms[0])
+        self.full = (1 << size) - 1
+        self.tables = []
+        for perm in perms:
+            tables = []
+            for base in range(0, size, CHUNK):
+                table = []
+                for chunk in range(1 << CHUNK):
+                    image = 0
+                    for bit in range(CHUNK):
+                        if chunk >> bit & 1 and base + bit < size:
+                            image |= 1 << perm[base + bit]
+                    table.append(image)
+                tables.append(tuple(table))
+            self.tables.append(tuple(tables))
+        self.offsets = tuple(size * t for t in range(len(perms) - 1))
+        self.packed = tuple(
+            tuple(sum(tables[c][chunk] << offset
+                      for tables, offset in zip(self.tables[1:], self.offsets))
+                  for chunk in range(1 << CHUNK))
+            for c in range(len(self.tables[0])))
+
+
+    def __len__(self):
+        return len(self.perms)
+
+
+    # Return the image of a packed state under symmetry t.
+    #
+    # t     ->  index of the symmetry in self.perms
+    # state ->  the packed board
+    def apply(self, t, state):
+        image = 0
+        for table in self.tables[t]:
+            image |= table[state & MASK]
+            state >>= CHUNK
+        return image
+
+
+    # Return the canonical form of a packed state: the smallest of its images
+    # under every symmetry of the board.
+    #
+    # state ->  the packed board
+    def canonical(self, state):
+        images, rest = 0, state
+        for table in self.packed:
+            images |= table[rest & MASK]
+            rest >>= CHUNK
+        best, full = state, self.full
+        for offset in self.offsets:
+            image = images >> offset & full
+            if image < best:
+                best = image
+        return best
+
+
+    # Return [canonical, t], the canonical form of a packed state and the
+    # index of the (first) symmetry that sends `state` to it.
+    #
+    # state ->  the packed board
+    def canonical_with(self, state):
+        best, best_t = state, 0
+        for t in range(1, len(self.tables)):
+            image = self.apply(t, state)
+            if image < best:
+                best, best_t = image, t
+        return [best, best_t]
+
+
+    # Return the index of the symmetry that undoes symmetry t.
+    #
+    # t ->  index of the symmetry in self.perms
+    def inverse(self, t):
+        perm = self.perms[t]
+        for u, other in enumerate(self.perms):
+            if all(other[perm[k]] == k for k in range(len(perm))):
+                return u
+        return None
+
+
+    # Return, per symmetry, the permutation of an engine's move indices that
+    # it induces. Lets a move stored for a canonical position be translated
+    # back to the position that was actually asked about.
+    #
+    # moves ->  array of (h, i, j) hole index triples, as in Engine.moves
+    def move_perms(self, moves):
+        index = { move: k for k, move in enumerate(moves) }
+        return [[index[(perm[h], perm[i], perm[j])] for h, i, j in moves]
+                for perm in self.perms]
+
+
+# ---------------------------------
+# STATIC FUNCTIONS BEYOND THIS POINT
+# ---------------------------------
+
+
+# Return the 6 symmetries of a triangular pegboard with `num_rows` rows: the
+# identity, 2 rotations and 3 reflections. Holes are numbered row by row from
+# the top, as in `triangle()`.
+#
+# Each hole is given "barycentric" coordinates (x, y, z), its distance from
+# the left edge, the right edge and the bottom row. They always add up to
+# num_rows - 1. Rotating the board cycles the coordinates, and reflecting it
+# swaps two of them.
+#
+# num_rows  ->  number of rows of the board
+def triangle_symmetries(num_rows):
+    coords = []
+    for r in range(num_rows):
+        for c in range(r + 1):
+            coords.append((c, r - c, num_rows - 1 - r))
+
+    # index of the hole with coordinates (x, y, z)
+    def index(x, y, z):
+        r = num_rows - 1 - z
+        return r * (r + 1) // 2 + x
+
+    maps = [
+        lambda x, y, z: (x, y, z),  # identity
+        lambda x, y, z: (y, z, x),  # rotate
+        lambda x, y, z: (z, x, y),  # rotate the other way
+        lambda x, y, z: (y, x, z),  # reflect across the vertical axis
+        lambda x, y, z: (z, y, x),  # reflect across the other two axes
+        lambda x, y, z: (x, z, y),
+    ]
+    return [tuple(index(*f(*coord)) for coord in coords) for f in maps]
+
+
+# Return the symmetries of a board laid out on a square grid: those of the
+# 8 rotations and reflections of the square that send every hole to a hole.
+# The identity comes first.
+#
+# coords    ->  array of the (row, column) of every hole, indexed by hole
+def grid_symmetries(coords):
+    n = max(max(r, c) for r, c in coords)
+    rows = max(r for r, _ in coords)
+    cols = max(c for _, c in coords)
+    maps = [
+        lambda r, c: (r, c),                # identity
+        lambda r, c: (c, n - r),            # rotate a quarter turn
+        lambda r, c: (n - r, n - c),        # rotate a half turn
+        lambda r, c: (n - c, r),            # rotate three quarters
+        lambda r, c: (r, cols - c),         # reflect left to right
+        lambda r, c: (rows - r, c),         # reflect top to bottom
+        lambda r, c: (c, r),                # reflect across the diagonals
+        lambda r, c: (n - c, n - r),
+    ]
+    index = { coord: k for k, coord in enumerate(coords) }
+    result = []
+    for f in maps:
+        perm = tuple(index.get(f(r, c)) for r, c in coords)
+        if None not in perm and perm not in result:
+            result.append(perm)
+    return result
@@ -0,0 +1,79 @@
+#
+# A bounded transposition table. Maps a packed board state (see engine.py) to
+#   whatever a search has already worked out about it, so that a position
+#   reached through different move orders is only searched once.
+#
+
+from collections import OrderedDict
+
+# Default number of positions kept before entries are evicted. Roughly 100
+# bytes per position on the 15-hole board, more for larger boards.
+CAPACITY = 1 << 20
+
+# Eviction policies understood by TranspositionTable
+#
+# lru   ->  evict the position that was used least recently
+# fifo  ->  evict the position that was stored first
+POLICIES = ("lru", "fifo")
+
+class TranspositionTable:
+
+
+    # capacity  ->  maximum number of positions kept. 0 disables the table
+    # policy    ->  which position to evict when the table is full, one of
+    #                   POLICIES
+    # entries   ->  the positions themselves, in eviction order (first out
+    #                   at the front)
+    # hits      ->  number of lookups that found a position
+    # misses    ->  number of lookups that did not
+    # evictions ->  number of positions evicted to make room
+    def __init__(self, capacity=CAPACITY, policy="lru"):
+        if policy not in POLICIES:
+            raise ValueError("Unknown eviction policy: {}".format(policy))
+        self.capacity = capacity
+        self.policy = policy
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    def __contains__(self, state):
+        return state in self.entries
+
+
+    # Return what is stored for `state`, or None if it is not in the table.
+    #
+    # state ->  the packed board
+    def get(self, state):
+        value = self.entries.get(state)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            if self.policy == "lru":
+                self.entries.move_to_end(state)
+        return value
+
+
+    # Store `value` for `state`, evicting a position if the table is full.
+    #
+    # state ->  the packed board
+    # value ->  anything but None
+    def put(self, state, value):
+        if self.capacity <= 0:
+            return
+        self.entries[state] = value
+        self.entries.move_to_end(state)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+
+    # Forget every position.
+    def clear(self):
+        self.entries.clear()
@@ -1,63 +1,125 @@
 #
-# An implementation of a doubly-linked list. Contains every move made since the
-#   start of the game. As such, it could be used to "play back" a game,
-#   starting from the head.
+# A compact record of every move made since the start of the game. Moves are
+#   stored as indices into the board's move table (Engine.moves), packed into a
+#   preallocated array used as a stack, so recording a move costs two bytes and
+#   no allocation. Turn objects, with their snapshot of the board, are only
+#   built when a turn is asked for, such as to print it or to "play back" a
+#   game starting from the head.
 #
+
+from array import array
+
 class Log:
 
-    # head  ->  head of a doubly-linked list, the start of the game
-    # tail  ->  tail of a doubly linked list, the last move made
-    def __init__(self):
-        self.head = None
-        self.tail = None
+    # board ->  the pegboard whose moves are recorded. Used to turn move
+    #               indices back into holes and to rebuild snapshots
+    # moves ->  stack of move indices, preallocated for the longest possible
+    #               game (every move removes a peg)
+    # count ->  number of moves on the stack
+    def __init__(self, board):
+        self.board = board
+        self.moves = array("H", bytes(2 * board.size))
+        self.count = 0
+
+
+    def __len__(self):
+        return self.count
+
 
+    # head  ->  node of the first move made, None if no move has been made
+    @property
+    def head(self):
+        return Node(self, 0) if self.count else None
 
-    # Add a new node containing the latest turn to this log.
+
+    # tail  ->  node of the last move made, None if no move has been made
+    @property
+    def tail(self):
+        return Node(self, self.count - 1) if self.count else None
+
+
+    # Add the latest move to this log.
     #
-    # turn  ->  the turn being added
-    def add(self, turn):
-        new_node = Node(turn)
-        if self.head is None:
-            self.head = new_node
-            self.tail = new_node
-        new_node.prev = self.tail
-        self.tail.next = new_node
-        self.tail = new_node
-
-
-    # Remove and return the last turn (not the node) of the list. Used to undo
-    # a turn.
+    # move  ->  index of the move in the board's move table
+    def add(self, move):
+        if self.count == len(self.moves):
+            self.moves.append(move)
+        else:
+            self.moves[self.count] = move
+        self.count += 1
+
+
+    # Remove and return the index of the last move. Used to undo a turn.
+    # Returns None if no move has been made.
     def pop(self):
 
         # empty list
-        if self.tail is None:
+        if self.count == 0:
             return None
 
-        last_turn = self.tail.turn
-        self.tail = self.tail.prev
+        self.count -= 1
+        return self.moves[self.count]
 
-        # removed first turn
-        if self.tail is None:
-            self.head = None
 
-        self.tail.next = None
+    # Return turn n (counting from 0), with a snapshot of the board right
+    # after it. The snapshot is rebuilt by undoing every later move on the
+    # current state of the board.
+    #
+    # n ->  index of the turn
+    def turn(self, n):
+        if n < 0:
+            n += self.count
+        if not 0 <= n < self.count:
+            raise IndexError("turn index out of range")
+        engine, holes = self.board.engine, self.board.holes
+        state = self.board.state
+        for move in self.moves[n + 1:self.count]:
+            state ^= engine.table[move][2]
+        h, i, j = engine.moves[self.moves[n]]
+        return Turn(holes[h], holes[i], holes[j],
+                    [state >> k & 1 for k in range(len(holes))])
+
+
+    def __getitem__(self, n):
+        return self.turn(n)
 
-        return last_turn
+
+    # Play back the game, one turn at a time from the start.
+    def __iter__(self):
+        for n in range(self.count):
+            yield self.turn(n)
 
 
 #
-# A simple node encapsulation for a doubly-linked list. Contains a Turn object.
+# A view of one turn of a Log, in the shape of a doubly-linked list node.
+#   Built on demand, so it costs nothing while the game is being played.
 #
 class Node:
 
 
+    # log   ->  the log this node belongs to
+    # n     ->  index of the turn in the log
+    def __init__(self, log, n):
+        self.log = log
+        self.n = n
+
+
     # turn  ->  the data - a turn object as specified below
-    # next  ->  another node
-    # prev  ->  the preceding node
-    def __init__(self, turn):
-        self.turn = turn
-        self.next = None
-        self.prev = None
+    @property
+    def turn(self):
+        return self.log.turn(self.n)
+
+
+    # next  ->  node of the following turn, None at the tail
+    @property
+    def next(self):
+        return Node(self.log, self.n + 1) if self.n + 1 < len(self.log) else None
+
+
+    # prev  ->  node of the preceding turn, None at the head
+    @property
+    def prev(self):
+        return Node(self.log, self.n - 1) if self.n > 0 else None
 
 #
 # Encapsulation of a single move.
@@ -68,12 +130,13 @@ class Turn:
     # h ->  the hole from which the peg was moved
     # i ->  the hole that was hopped over
     # j ->  the hole the peg was moved to
-    # s ->  array representing the current state of the board
+    # s ->  array of whether each hole holds a peg right after the move,
+    #           stored as the glyphs used to print the board
     def __init__(self, h, i, j, s):
         self.h = h
         self.i = i
         self.j = j
-        self.s = list(map(lambda hole: "\u257F" if hole.has_peg else "\u25CB", s))
+        self.s = list(map(lambda peg: "\u257F" if peg else "\u25CB", s))
 
 
     def __str__(self):
@@ -0,0 +1,157 @@
+#
+# A breadth-first version of Engine.solve() on NumPy arrays. Every move takes
+#   exactly one peg off the board, so the positions reachable from a board
+#   fall into layers by peg count. Each layer is held as a uint64 array of
+#   packed boards alongside an array of path counts, the number of move orders
+#   leading to each board. The next layer is made by applying every move to
+#   the whole layer at once, and boards reached more than once are merged by
+#   np.unique, adding up their path counts. A board with no legal move ends
+#   that many games, which is all the histogram needs.
+#
+#   Several boards with the same number of pegs can be solved in one pass by
+#   keeping one column of path counts per board. Positions reached from more
+#   than one of them are then only expanded once.
+#
+# NumPy is optional. It is imported the first time a solve is run, so the rest
+# of the game works without it.
+#
+
+import importlib.util
+
+from stats import Cancelled
+
+# Number of bits in the packed boards of a layer
+BITS = 64
+
+
+# Return whether NumPy is installed, so that solve() can be used.
+def available():
+    return importlib.util.find_spec("numpy") is not None
+
+
+# Return the same histogram as Engine.solve(), worked out layer by layer.
+# Raises ImportError if NumPy is not installed.
+#
+# engine    ->  Engine of the board. Its symmetry, if any, is used to merge
+#                   the rotations and reflections of every board in a layer
+# state     ->  the packed board
+# pegs      ->  number of pegs on the board
+# stats     ->  SearchStats to count into, or None. Every board in every
+#                   layer counts as a position visited, and stats.done
+#                   follows the layers finished. Checked for cancellation
+#                   before every layer: the Cancelled raised then holds, in
+#                   its `counts`, the games ending in the layers finished
+def solve(engine, state, pegs, stats=None):
+    try:
+        return _solve(engine, [state], pegs, stats)[0]
+    except Cancelled as cancelled:
+        cancelled.counts = cancelled.counts[0]
+        raise
+
+
+# Return an array with, for every move that can be made from `state` (in
+# table order), [k, counts]: the index of the move and the histogram
+# Engine.solve() gives after it. Every move is solved in the same pass.
+# Raises ImportError if NumPy is not installed.
+#
+# engine    ->  Engine of the board
+# state     ->  the packed board
+# pegs      ->  number of pegs on the board
+# stats     ->  SearchStats to count into, or None, as for solve()
+def analyze(engine, state, pegs, stats=None):
+    moves = engine.legal_moves(state)
+    if not moves:
+        return []
+    children = [state ^ engine.table[k][2] for k in moves]
+    return [[k, counts] for k, counts in zip(moves, _solve(engine, children, pegs - 1, stats))]
+
+
+# Helper method for solve and analyze. Returns the histograms of `states`,
+# which all have `pegs` pegs, keeping one column of path counts per state.
+def _solve(engine, states, pegs, stats):
+    np = _numpy()
+    if engine.size > BITS:
+        raise ValueError("boards of {} holes do not fit in {} bits".format(engine.size, BITS))
+    masks = np.array([need | land for need, land, _ in engine.table], dtype=np.uint64)
+    needs = np.array([need for need, _, _ in engine.table], dtype=np.uint64)
+    canonical = _canonical(np, engine.symmetry)
+
+    # a board is reached from at most one board per move into it, per
+    # symmetry, so path counts can only overflow once one is above this
+    images = 1 if engine.symmetry is None else len(engine.symmetry)
+    limit = (1 << BITS) // max(1, len(engine.table) * images)
+
+    counts = [dict() for _ in states]
+    layer, inverse = np.unique(canonical(np.array(states, dtype=np.uint64)), return_inverse=True)
+    paths = np.zeros((len(layer), len(states)), dtype=np.uint64)
+    paths[inverse.reshape(-1), np.arange(len(states))] = 1
+    layers = max(1, pegs - 1)
+    while len(layer):
+        if stats is not None:
+            try:
+                stats.check()
+            except Cancelled as cancelled:
+                cancelled.counts = counts
+                raise
+        if paths.dtype != object and int(paths.max()) >= limit:
+            paths = paths.astype(object)    # Python ints from here on
+        children, child_paths = [], []
+        stuck = np.ones(len(layer), dtype=bool)
+        for mask, need in zip(masks, needs):
+            legal = layer & mask == need
+            if legal.any():
+                stuck &= ~legal
+                children.append(layer[legal] ^ mask)
+                child_paths.append(paths[legal])
+
+        if stats is not None:
+            stats.nodes += len(layer)
+            stats.leaves += int(stuck.sum())
+            stats.lowest = min(stats.lowest, pegs)
+            stats.done = min(1.0, (layers - pegs + 2) / layers)
+        if stuck.any():
+            for column, games in enumerate(paths[stuck].astype(object).sum(axis=0)):
+                if games:
+                    counts[column][pegs] = counts[column].get(pegs, 0) + int(games)
+        if not children:
+            break
+
+        layer, inverse = np.unique(canonical(np.concatenate(children)), return_inverse=True)
+        paths, merged = np.zeros((len(layer), len(states)), dtype=paths.dtype), np.concatenate(child_paths)
+        np.add.at(paths, inverse, merged)
+        pegs -= 1
+    return counts
+
+
+# Helper method for solve. Returns the numpy module, imported on first use.
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("vectorized.solve() needs NumPy, which can be installed "
+                          "with `pip install numpy`") from None
+    return numpy
+
+
+# Helper method for solve. Returns a function mapping an array of packed
+# boards to their canonical forms, using the chunk lookup tables of
+# `symmetry` on whole arrays.
+#
+# symmetry  ->  Symmetry of the board, or None to leave boards as they are
+def _canonical(np, symmetry):
+    if symmetry is None:
+        return lambda boards: boards
+    from symmetry import CHUNK, MASK
+    tables = np.array(symmetry.tables[1:], dtype=np.uint64)
+    shifts = [np.uint64(CHUNK * c) for c in range(tables.shape[1])]
+
+    def canonical(boards):
+        chunks = [(boards >> shift & np.uint64(MASK)).astype(np.intp) for shift in shifts]
+        best = boards
+        for table in tables:
+            image = table[0][chunks[0]]
+            for c in range(1, len(chunks)):
+                image |= table[c][chunks[c]]
+            best = np.minimum(best, image)
+        return best
+    return canonical